@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, firestore
 from pydantic import ValidationError
+from models.request_helpers import parse_fields, parse_batch_ids, batch_get_documents
 from models.customer_model import CustomerModel
 
 load_dotenv()  # Loads the .env file
@@ -45,6 +46,17 @@ def get_customers():
         customers.append(data)
     return jsonify(customers), 200
 
+# Upper bound for the number of customers fetched by one batchGet request
+MAX_BATCH_GET = int(os.getenv("CUSTOMER_MAX_BATCH_GET", "300"))
+
+# POST to fetch many customers by ID in one request.
+# Body: {"customer_ids": [...]}; optional ?fields=a,b returns only those fields (plus id)
+@app.route('/customers:batchGet', methods=['POST'])
+def batch_get_customers():
+    ids = parse_batch_ids(request.get_json(), 'customer_ids', MAX_BATCH_GET, 'customers')
+    records, missing = batch_get_documents(db, 'customers', ids, parse_fields())
+    return jsonify({"customers": records, "missing": missing}), 200
+
 # GET a specific customer by document ID
 @app.route('/customers/<customer_id>', methods=['GET'])
 def get_customer(customer_id):
@@ -73,56 +85,97 @@ def get_customer_credits(customer_id):
         "customer_credits": customer_data.get('customer_credits', 0)
     }), 200
 
+class CreditError(Exception):
+    def __init__(self, message, code, credits=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.credits = credits
+
+# Helper function to add/subtract credits in one transaction. Only the credits field is
+# read and written, so concurrent top-ups and payments cannot overwrite each other.
+# Returns (previous_credits, new_credits).
+@firestore.transactional
+def adjust_customer_credits(transaction, doc_ref, amount, allow_negative=False):
+    doc = doc_ref.get(field_paths=['customer_credits'], transaction=transaction)
+    if not doc.exists:
+        raise CreditError("Customer not found", 404)
+
+    current_credits = (doc.to_dict() or {}).get('customer_credits', 0)
+    new_credits = round(current_credits + amount, 2)
+    if new_credits < 0 and not allow_negative:
+        raise CreditError("Operation would result in negative credits", 400, current_credits)
+
+    transaction.update(doc_ref, {'customer_credits': new_credits})
+    return current_credits, new_credits
+
 # PATCH to update customer credits
 @app.route('/customers/<customer_id>/credits', methods=['PATCH'])
 def update_customer_credits(customer_id):
     """Update a customer's credit balance by adding/subtracting the specified amount"""
-    doc_ref = db.collection('customers').document(customer_id)
-    doc = doc_ref.get()
+    data = request.get_json()
+    if not data or 'amount' not in data:
+        abort(400, description="Request must include 'amount' field")
     
-    if not doc.exists:
-        abort(404, description="Customer not found")
+    try:
+        # Get the amount to add/subtract (can be negative for deductions)
+        amount = float(data['amount'])
+    except (ValueError, TypeError):
+        abort(400, description="Amount must be a number")
     
+    doc_ref = db.collection('customers').document(customer_id)
+    try:
+        current_credits, new_credits = adjust_customer_credits(
+            db.transaction(), doc_ref, amount, data.get('allow_negative', False)
+        )
+    except CreditError as e:
+        abort(e.code, description=e.message)
+    
+    # Return success response with updated credit information
+    return jsonify({
+        "customer_id": customer_id,
+        "previous_credits": current_credits,
+        "amount_changed": amount,
+        "new_credits": new_credits
+    }), 200
+
+# Error code returned (with status 409) when a debit is refused for lack of credits
+INSUFFICIENT_CREDITS = "insufficient_credits"
+
+# POST to debit customer credits only if the balance covers the amount.
+# The balance check and the deduction happen in the same transaction.
+@app.route('/customers/<customer_id>/credits:debit', methods=['POST'])
+def debit_customer_credits(customer_id):
     data = request.get_json()
     if not data or 'amount' not in data:
         abort(400, description="Request must include 'amount' field")
     
     try:
-        # Get the amount to add/subtract (can be negative for deductions)
         amount = float(data['amount'])
-        
-        # Get the current customer data
-        current_data = doc.to_dict()
-        current_credits = current_data.get('customer_credits', 0)
-        
-        # Calculate new credit balance
-        new_credits = current_credits + amount
-        
-        # Prevent negative balance if needed
-        if new_credits < 0 and not data.get('allow_negative', False):
-            abort(400, description="Operation would result in negative credits")
-        
-        # Update the customer's credits
-        current_data.update({'customer_credits': new_credits})
-        
-        # Validate the updated data with Pydantic
-        updated_customer = CustomerModel(**current_data)
-        
-        # Update just the credits field in Firestore
-        doc_ref.update({'customer_credits': new_credits})
-        
-        # Return success response with updated credit information
-        return jsonify({
-            "customer_id": customer_id,
-            "previous_credits": current_credits,
-            "amount_changed": amount,
-            "new_credits": new_credits
-        }), 200
-        
-    except ValueError:
+    except (ValueError, TypeError):
         abort(400, description="Amount must be a number")
-    except ValidationError as e:
-        return jsonify({"error": str(e)}), 400
+    if amount <= 0:
+        abort(400, description="Amount must be greater than zero")
+    
+    doc_ref = db.collection('customers').document(customer_id)
+    try:
+        current_credits, new_credits = adjust_customer_credits(db.transaction(), doc_ref, -amount)
+    except CreditError as e:
+        if e.credits is None:
+            abort(e.code, description=e.message)
+        return jsonify({
+            "error": "Insufficient credits",
+            "code": INSUFFICIENT_CREDITS,
+            "customer_credits": e.credits,
+            "required_amount": amount
+        }), 409
+    
+    return jsonify({
+        "customer_id": customer_id,
+        "previous_credits": current_credits,
+        "amount_changed": -amount,
+        "new_credits": new_credits
+    }), 200
 
 # POST a new customer
 @app.route('/customers', methods=['POST'])
@@ -1,18 +1,30 @@
+import argparse
+import hashlib
+import json
 import os
 import sys
-from datetime import datetime
-from flask import Flask, request, jsonify, abort
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import Flask, Response, request, jsonify, abort, make_response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as google_exceptions
 from pydantic import ValidationError
 
 # Add parent directory to path to resolve module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import the Pydantic model
-from models.order_model import OrderModel, OrderItemModel
+from models.order_model import OrderModel, OrderItemModel, OrderStatus, can_transition
+from models.request_helpers import (
+    parse_fields as parse_request_fields, project, parse_batch_ids,
+    encode_page_token as encode_cursor, decode_page_token as decode_cursor,
+)
 
 load_dotenv()  # Loads the .env file
 
@@ -26,7 +38,443 @@ if not firebase_admin._apps:
 db = firestore.client()
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=["X-Next-Page-Token", "ETag"])  # Enable CORS for all routes
+
+# Max number of order_items subcollections fetched concurrently for list endpoints
+ORDER_ITEMS_FETCH_WORKERS = int(os.getenv("ORDER_ITEMS_FETCH_WORKERS", "16"))
+
+# Where order items are written:
+#   "subcollection" - one document per item in orders/<id>/order_items (default)
+#   "embedded"      - an "order_items" array on the order document itself
+# Reads always accept both layouts, so the mode can be switched while old orders are migrated.
+ORDER_ITEMS_STORAGE = os.getenv("ORDER_ITEMS_STORAGE", "subcollection")
+if ORDER_ITEMS_STORAGE not in ("subcollection", "embedded"):
+    raise ValueError("ORDER_ITEMS_STORAGE must be 'subcollection' or 'embedded'")
+
+# Helper function to read the "order_items" subcollection of a single order
+def get_order_items(order_ref):
+    items = []
+    for item_doc in order_ref.collection('order_items').stream():
+        item = item_doc.to_dict()
+        item['id'] = item_doc.id
+        items.append(item)
+    return items
+
+# Helper function to check whether an order document stores its items inline
+def has_embedded_items(order_data):
+    return isinstance(order_data.get('order_items'), list)
+
+# Helper function to read the items of an order snapshot in either storage layout
+def read_order_items(doc):
+    order_data = doc.to_dict() or {}
+    if has_embedded_items(order_data):
+        return order_data['order_items']
+    return get_order_items(doc.reference)
+
+# Helper function to turn a list of order snapshots into order dicts with their items.
+# Embedded items are used as-is; subcollections are fetched with bounded parallelism
+# and joined in memory, so list latency no longer grows with one round trip per order.
+# With include_items=False the item lookups are skipped entirely.
+def build_orders(docs, include_items=True):
+    orders = []
+    pending = []
+    for doc in docs:
+        order = doc.to_dict()
+        order['id'] = doc.id
+        if include_items and not has_embedded_items(order):
+            pending.append((order, doc.reference))
+        orders.append(order)
+
+    if pending:
+        workers = max(1, min(ORDER_ITEMS_FETCH_WORKERS, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            items_per_order = list(executor.map(lambda p: get_order_items(p[1]), pending))
+        for (order, _), items in zip(pending, items_per_order):
+            order['order_items'] = items
+    return orders
+
+# Helpers for the optional ?fields=a,b,c sparse projection on read endpoints.
+# Requested fields map to a Firestore select(), and "order_items" must be requested
+# for the items to be loaded at all.
+def parse_fields():
+    return parse_request_fields(whole_fields=('order_items',))
+
+def select_paths(fields, *required):
+    paths = [f for f in fields if f != 'id']
+    paths += [f for f in required if f not in paths]
+    # An empty projection still has to name something, the document id costs nothing extra
+    return paths or [firestore.FieldPath.document_id()]
+
+# Helper functions for ETag / If-None-Match conditional GETs.
+# Every write to an order (including its items) updates the order document, so the
+# document update times are enough to tell whether a response has changed.
+def version_of(snapshot):
+    update_time = snapshot.update_time.timestamp_pb()
+    return f"{update_time.seconds}.{update_time.nanos:09d}"
+
+def make_etag(*parts):
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+def is_not_modified(etag):
+    return request.if_none_match.contains(etag)
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified_response(etag):
+    return with_etag(make_response('', 304), etag)
+
+# Helper function to stage the items of an order into a write batch (or transaction) using the configured
+# storage mode. legacy_item_docs are existing subcollection items to remove.
+# In embedded mode the items are also placed on order_data under "order_items".
+# Returns the item dicts (with ids) as they will be stored.
+def stage_order_items(batch, order_ref, order_data, item_models, legacy_item_docs=()):
+    for item_doc in legacy_item_docs:
+        batch.delete(item_doc.reference)
+
+    items = []
+    for item_model in item_models:
+        # document() only allocates an id locally, it does not touch Firestore
+        item_ref = order_ref.collection('order_items').document()
+        if ORDER_ITEMS_STORAGE == "subcollection":
+            batch.set(item_ref, item_model.to_dict())
+        items.append({**item_model.to_dict(), 'id': item_ref.id})
+
+    if ORDER_ITEMS_STORAGE == "embedded":
+        order_data['order_items'] = items
+    return items
+
+# Firestore allows at most 500 writes in a single batch commit
+MAX_BATCH_WRITES = 500
+
+# Upper bound for the "limit" query parameter on order list endpoints
+MAX_PAGE_SIZE = int(os.getenv("ORDER_MAX_PAGE_SIZE", "100"))
+
+# Completed and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved from "orders"
+# into this collection (with their items embedded) by the background archiver
+ARCHIVE_COLLECTION = "orders_archive"
+ORDER_ARCHIVE_AFTER_DAYS = float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "30"))
+# How often the archiver runs; 0 disables the background thread
+ORDER_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ORDER_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Upper bound for the number of orders fetched by one batchGet request
+MAX_BATCH_GET = int(os.getenv("ORDER_MAX_BATCH_GET", "300"))
+
+# Helpers for the opaque "page_token" cursor, keyed on (order_start, id)
+def encode_page_token(doc):
+    return encode_cursor(doc, 'order_start')
+
+def decode_page_token(token):
+    return decode_cursor(token, 'order_start')
+
+# Helper function to read the ?include_archived= flag
+def include_archived():
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+# Helper function to add the ?status=a,b and ?since=<iso> filters of the order list
+# endpoints to the given (field, op, value) tuples
+def parse_order_filters(filters):
+    filters = list(filters)
+    status = request.args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        valid_statuses = {s.value for s in OrderStatus}
+        if not statuses or any(s not in valid_statuses for s in statuses):
+            abort(400, description=f"'status' must be one of {sorted(valid_statuses)}")
+        if len(statuses) == 1:
+            filters.append(('order_status', '==', statuses[0]))
+        else:
+            filters.append(('order_status', 'in', statuses))
+
+    since = request.args.get('since')
+    if since:
+        try:
+            since_value = datetime.fromisoformat(since).isoformat()
+        except ValueError:
+            abort(400, description="'since' must be an ISO 8601 timestamp")
+        filters.append(('order_start', '>=', since_value))
+
+    return filters
+
+# Helper function shared by the order list endpoints. filters are (field, op, value) tuples.
+# Supports ?status=a,b ?since=<iso> ?order_by=order_start desc|asc ?limit=N ?page_token=... ?fields=a,b
+# and ?include_archived=true to merge in orders from the archive collection.
+# The body stays a JSON list; the cursor for the next page is returned in X-Next-Page-Token.
+def list_orders(*filters):
+    filters = parse_order_filters(filters)
+
+    order_by = request.args.get('order_by', 'order_start desc').split()
+    if not order_by or order_by[0] != 'order_start' or len(order_by) > 2 \
+            or (len(order_by) == 2 and order_by[1].lower() not in ('asc', 'desc')):
+        abort(400, description="'order_by' must be 'order_start desc' or 'order_start asc'")
+    descending = order_by[-1].lower() != 'asc'
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+
+    page_token = request.args.get('page_token')
+    cursor = decode_page_token(page_token) if page_token else None
+
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(400, description="'limit' must be an integer")
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            abort(400, description=f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+
+    fields = parse_fields()
+
+    # The same query runs against the live orders and, if requested, the archive.
+    # Both tiers share the (order_start, id) ordering, so one cursor works for both.
+    collections = ['orders', ARCHIVE_COLLECTION] if include_archived() else ['orders']
+    docs = []
+    for collection in collections:
+        query = db.collection(collection)
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        # Order by document id as a tie-breaker so the cursor is stable
+        query = query.order_by('order_start', direction=direction)
+        query = query.order_by(firestore.FieldPath.document_id(), direction=direction)
+        if cursor:
+            query = query.start_after(cursor)
+        if limit is not None:
+            # Read one extra document to know whether another page exists
+            query = query.limit(limit + 1)
+        if fields:
+            # order_start is always read because the page cursor is built from it
+            query = query.select(select_paths(fields, 'order_start'))
+        docs.extend(query.stream())
+
+    if len(collections) > 1:
+        docs.sort(key=lambda doc: (doc.get('order_start'), doc.id), reverse=descending)
+
+    next_page_token = None
+    if limit is not None and len(docs) > limit:
+        docs = docs[:limit]
+        next_page_token = encode_page_token(docs[-1])
+
+    # Checked before any items are loaded, so an unchanged page costs only the query
+    etag = make_etag(
+        ",".join(f"{doc.id}@{version_of(doc)}" for doc in docs),
+        ",".join(fields or []),
+        next_page_token or ""
+    )
+    if is_not_modified(etag):
+        response = not_modified_response(etag)
+        if next_page_token:
+            response.headers['X-Next-Page-Token'] = next_page_token
+        return response
+
+    if fields:
+        orders = [project(order, fields) for order in build_orders(docs, 'order_items' in fields)]
+    else:
+        orders = build_orders(docs)
+
+    response = with_etag(jsonify(orders), etag)
+    if next_page_token:
+        response.headers['X-Next-Page-Token'] = next_page_token
+    return response, 200
+
+# Read-through cache for single orders (document plus items, with the document version),
+# bounded by size and age.
+# Every write route invalidates the order it touches. The cache is per process, so the
+# TTL bounds how stale an entry can get if another instance writes the same order.
+class OrderCache:
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidations are stamped from a counter and remembered per order (oldest first),
+        # so a read that raced with a write to *its* order is not cached while fills of
+        # other orders still are. When the tombstones overflow, the oldest are dropped and
+        # fills that started before them are refused instead.
+        self._clock = 0
+        self._tombstones = OrderedDict()  # order_id -> clock of its last invalidation
+        self._max_tombstones = max(max_size, 1024)
+        self._min_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self):
+        """Token to take before reading an order from Firestore and pass to put()"""
+        with self._lock:
+            return self._clock
+
+    def get(self, order_id):
+        with self._lock:
+            entry = self._entries.get(order_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[order_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(order_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, order_id, order, generation):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation < self._min_generation or self._tombstones.get(order_id, -1) > generation:
+                return
+            self._entries[order_id] = (time.monotonic() + self.ttl_seconds, order)
+            self._entries.move_to_end(order_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *order_ids):
+        with self._lock:
+            self._clock += 1
+            for order_id in order_ids:
+                self._tombstones[order_id] = self._clock
+                self._tombstones.move_to_end(order_id)
+                if self._entries.pop(order_id, None) is not None:
+                    self.invalidations += 1
+            while len(self._tombstones) > self._max_tombstones:
+                _, clock = self._tombstones.popitem(last=False)
+                self._min_generation = max(self._min_generation, clock)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+# ORDER_CACHE_SIZE=0 disables caching
+order_cache = OrderCache(
+    max_size=int(os.getenv("ORDER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("ORDER_CACHE_TTL_SECONDS", "30"))
+)
+
+# Change feed for orders. A Firestore snapshot listener on recent orders records
+# every add/modify/remove as an ordered event in a bounded ring buffer, and clients follow
+# it with an opaque token instead of re-fetching whole orders. The token is
+# "<epoch>-<seq>"; the epoch changes whenever the listener is (re)started, because
+# events may have been missed in between and old tokens can no longer be honoured.
+# Only orders started within window_hours of the listener start are watched, so a
+# (re)start reads the recent orders instead of the whole collection; older orders
+# rarely change and their cached copies expire after ORDER_CACHE_TTL_SECONDS anyway.
+class OrderChangeFeed:
+    def __init__(self, max_events, window_hours):
+        self._window = timedelta(hours=window_hours)
+        self._events = deque(maxlen=max_events)
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._epoch = None
+        self._watch = None
+        self._skip_initial_snapshot = True
+
+    def is_healthy(self):
+        watch = self._watch
+        return watch is not None and watch.is_active
+
+    def start(self):
+        with self._condition:
+            if self.is_healthy():
+                return
+            if self._watch is not None:
+                print("Order change listener stopped, restarting it")
+            self._events.clear()
+            self._epoch = str(int(time.time() * 1000))
+            self._skip_initial_snapshot = True
+            window_start = (datetime.now() - self._window).isoformat()
+            query = db.collection('orders').where('order_start', '>=', window_start)
+            self._watch = query.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._condition:
+            # The first callback replays the whole collection, which is not a change
+            if self._skip_initial_snapshot:
+                self._skip_initial_snapshot = False
+                return
+            for change in changes:
+                doc = change.document
+                event_type = change.type.name.lower()
+                event = {
+                    'seq': self._seq + 1,
+                    'type': event_type,
+                    'order_id': doc.id,
+                    'read_time': read_time.isoformat() if read_time else None
+                }
+                if event_type != 'removed':
+                    order = doc.to_dict()
+                    # Items are left out to keep events small; fetch the order if they are needed
+                    order.pop('order_items', None)
+                    order['id'] = doc.id
+                    event['order'] = order
+                self._seq += 1
+                self._events.append(event)
+            self._condition.notify_all()
+        # Also keeps this process's cache honest about writes made by other instances
+        order_cache.invalidate(*[change.document.id for change in changes])
+
+    def token(self, seq):
+        return f"{self._epoch}-{seq}"
+
+    def parse_token(self, token):
+        """Return the sequence number after which to read, or None if the token is too old"""
+        if not token:
+            return self._events[0]['seq'] - 1 if self._events else self._seq
+        epoch, _, seq = token.partition('-')
+        if epoch != self._epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        # Events after seq must still be in the buffer
+        if self._events and seq < self._events[0]['seq'] - 1:
+            return None
+        if not self._events and seq < self._seq:
+            return None
+        return seq
+
+    def latest_token(self):
+        with self._condition:
+            return self.token(self._seq)
+
+    def read(self, token, limit, timeout=0):
+        """Return (events, next_token), or None if the client has to resync"""
+        with self._condition:
+            seq = self.parse_token(token)
+            if seq is None:
+                return None
+            if timeout and seq == self._seq:
+                self._condition.wait(timeout)
+                # The listener may have been restarted while we waited
+                seq = self.parse_token(token) if token else seq
+                if seq is None:
+                    return None
+            events = [event for event in self._events if event['seq'] > seq][:limit]
+            next_seq = events[-1]['seq'] if events else seq
+            return events, self.token(next_seq)
+
+# ORDER_CHANGE_FEED_SIZE bounds how far behind a consumer can fall before it must resync;
+# ORDER_CHANGE_FEED_WINDOW_HOURS bounds which orders the listener watches
+order_changes = OrderChangeFeed(
+    max_events=int(os.getenv("ORDER_CHANGE_FEED_SIZE", "1000")),
+    window_hours=float(os.getenv("ORDER_CHANGE_FEED_WINDOW_HOURS", "24"))
+)
+
+@app.before_request
+def ensure_order_change_listener():
+    try:
+        order_changes.start()
+    except Exception as e:
+        print(f"Could not start order change listener: {str(e)}")
 
 # TEST
 @app.route('/test', methods=['GET'])
@@ -36,38 +484,133 @@ def test():
 # GET all orders (including their order items)
 @app.route('/orders', methods=['GET'])
 def get_orders():
-    orders_ref = db.collection('orders')
-    docs = orders_ref.stream()
-    orders = []
-    for doc in docs:
-        order = doc.to_dict()
-        order['id'] = doc.id
-        # Get order items from subcollection "order_items"
-        items = []
-        for item_doc in doc.reference.collection('order_items').stream():
-            item = item_doc.to_dict()
-            item['id'] = item_doc.id
-            items.append(item)
-        order['order_items'] = items
-        orders.append(order)
-    return jsonify(orders), 200
+    return list_orders()
 
 # GET a specific order by order_id.
 @app.route('/orders/<order_id>', methods=['GET'])
 def get_order(order_id):
+    fields = parse_fields()
+    cached = order_cache.get(order_id)
+    if cached is not None:
+        order, version = cached
+        etag = make_etag(order_id, version, ",".join(fields or []))
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        return with_etag(jsonify(project(order, fields) if fields else order), etag), 200
+    
+    generation = order_cache.generation()
     doc_ref = db.collection('orders').document(order_id)
-    doc = doc_ref.get()
+    doc = doc_ref.get(field_paths=select_paths(fields) if fields else None)
+    archived = False
+    if not doc.exists and include_archived():
+        archived = True
+        doc = db.collection(ARCHIVE_COLLECTION).document(order_id).get(
+            field_paths=select_paths(fields) if fields else None)
     if not doc.exists:
         abort(404, description="Order not found")
+    version = version_of(doc)
+    etag = make_etag(order_id, version, ",".join(fields or []))
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    
     order = doc.to_dict()
     order['id'] = doc.id
-    items = []
-    for item_doc in doc_ref.collection('order_items').stream():
-        item = item_doc.to_dict()
-        item['id'] = item_doc.id
-        items.append(item)
-    order['order_items'] = items
-    return jsonify(order), 200
+    if fields:
+        # Projected reads are partial documents, so they are not cached
+        if 'order_items' in fields:
+            order['order_items'] = read_order_items(doc)
+        return with_etag(jsonify(project(order, fields)), etag), 200
+    order['order_items'] = read_order_items(doc)
+    # Only live orders are cached, so a cached order is never an archived one
+    if not archived:
+        order_cache.put(order_id, (order, version), generation)
+    return with_etag(jsonify(order), etag), 200
+
+# GET hit/miss counters of the order cache
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(order_cache.stats()), 200
+
+# GET order changes after ?since=<token> (all buffered changes if omitted).
+# Returns 410 when the token is too old or from a previous listener, and the
+# client should re-fetch the orders it follows and continue from next_token.
+@app.route('/orders/changes', methods=['GET'])
+def get_order_changes():
+    try:
+        limit = min(int(request.args.get('limit', MAX_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400, description="'limit' must be an integer")
+    if limit < 1:
+        abort(400, description="'limit' must be positive")
+    
+    result = order_changes.read(request.args.get('since'), limit)
+    if result is None:
+        return jsonify({
+            "error": "Change token expired, re-fetch orders and resume from next_token",
+            "next_token": order_changes.latest_token()
+        }), 410
+    changes, next_token = result
+    return jsonify({"changes": changes, "next_token": next_token}), 200
+
+# GET order changes as a Server-Sent Events stream, resuming from ?since=<token>
+# or the Last-Event-ID header. A "resync" event is sent if the position is lost.
+@app.route('/orders/changes/stream', methods=['GET'])
+def stream_order_changes():
+    token = request.args.get('since') or request.headers.get('Last-Event-ID')
+    
+    def generate(token):
+        while True:
+            result = order_changes.read(token, MAX_PAGE_SIZE, timeout=15)
+            if result is None:
+                next_token = order_changes.latest_token()
+                yield f"event: resync\ndata: {json.dumps({'next_token': next_token})}\n\n"
+                token = next_token
+                continue
+            changes, token = result
+            if not changes:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            for change in changes:
+                yield (f"id: {order_changes.token(change['seq'])}\n"
+                       f"event: order_change\n"
+                       f"data: {json.dumps(change, default=str)}\n\n")
+    
+    return Response(stream_with_context(generate(token)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# POST to fetch many orders (and their items) by ID in one request.
+# Body: {"order_ids": [...]}; supports the same ?fields= and ?include_archived= as GET /orders/<id>
+@app.route('/orders:batchGet', methods=['POST'])
+def batch_get_orders():
+    order_ids = parse_batch_ids(request.get_json(), 'order_ids', MAX_BATCH_GET, 'orders')
+    fields = parse_fields()
+    refs = [db.collection('orders').document(order_id) for order_id in order_ids]
+    docs = [
+        doc for doc in db.get_all(refs, field_paths=select_paths(fields) if fields else None)
+        if doc.exists
+    ]
+    if include_archived() and len(docs) < len(order_ids):
+        found = {doc.id for doc in docs}
+        archive_refs = [db.collection(ARCHIVE_COLLECTION).document(order_id)
+                        for order_id in order_ids if order_id not in found]
+        docs += [
+            doc for doc in db.get_all(archive_refs, field_paths=select_paths(fields) if fields else None)
+            if doc.exists
+        ]
+    
+    include_items = not fields or 'order_items' in fields
+    orders_by_id = {order['id']: order for order in build_orders(docs, include_items)}
+    orders = []
+    missing = []
+    for order_id in order_ids:
+        if order_id not in orders_by_id:
+            missing.append(order_id)
+        elif fields:
+            orders.append(project(orders_by_id[order_id], fields))
+        else:
+            orders.append(orders_by_id[order_id])
+    
+    return jsonify({"orders": orders, "missing": missing}), 200
 
 # POST create a new order (with multiple order items) using Pydantic validation.
 @app.route('/orders', methods=['POST'])
@@ -83,23 +626,20 @@ def create_order():
         # Build order document data for Firestore
         order_data = order_model.to_dict()
         
-        # Create order document
-        doc_ref = db.collection('orders').document()
-        doc_ref.set(order_data)
+        if len(order_model.order_items) + 1 > MAX_BATCH_WRITES:
+            return jsonify({"error": f"An order can have at most {MAX_BATCH_WRITES - 1} items"}), 400
         
-        # Process and add each order item to the "order_items" subcollection
-        for item in order_model.order_items:
-            doc_ref.collection('order_items').add(item.to_dict())
+        # Create the order document and its items in a single atomic commit
+        doc_ref = db.collection('orders').document()
+        batch = db.batch()
+        new_items = stage_order_items(batch, doc_ref, order_data, order_model.order_items)
+        batch.set(doc_ref, order_data)
+        batch.commit()
         
         # Return the new order with its ID and items
         new_order = order_data
         new_order['id'] = doc_ref.id
-        
-        # Include serialized order items in the response
-        new_order['order_items'] = [
-            {**item.to_dict(), 'id': i} 
-            for i, item in enumerate(order_model.order_items)
-        ]
+        new_order['order_items'] = new_items
         
         return jsonify(new_order), 201
         
@@ -107,77 +647,159 @@ def create_order():
         return jsonify({"error": str(e)}), 400
 
 
-# PUT update an existing order.
-@app.route('/orders/<order_id>', methods=['PUT'])
-def update_order(order_id):
-    data = request.get_json()
-    if not data:
-        abort(400, description="Missing JSON body")
-    
-    order_doc_ref = db.collection('orders').document(order_id)
-    order_doc = order_doc_ref.get()
+# Error raised while validating or applying an order update
+class OrderUpdateError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+# Reads the order with its items and writes the whole update inside one transaction.
+# Status and picker changes are validated by the state machine (as in
+# PATCH /orders/<id>/status), and the order write carries an update-time precondition,
+# so a PUT can neither skip a transition nor overwrite a concurrent change.
+# Returns the updated order with its items.
+@firestore.transactional
+def apply_order_update(transaction, order_ref, data):
+    order_doc = order_ref.get(transaction=transaction)
     if not order_doc.exists:
-        abort(404, description="Order not found")
+        raise OrderUpdateError("Order not found", 404)
     
     # Get current data and merge with update
     current_data = order_doc.to_dict()
     
-    # Get current order items
-    current_items = []
-    for item_doc in order_doc_ref.collection('order_items').stream():
-        item = item_doc.to_dict()
-        item['id'] = item_doc.id
-        current_items.append(item)
+    # Get current order items (they are also needed for validation)
+    embedded = has_embedded_items(current_data)
+    if embedded:
+        current_item_docs = []
+        current_items = current_data.pop('order_items')
+    else:
+        current_item_docs = list(order_ref.collection('order_items').stream(transaction=transaction))
+        current_items = []
+        for item_doc in current_item_docs:
+            item = item_doc.to_dict()
+            item['id'] = item_doc.id
+            current_items.append(item)
     
+    data = dict(data)
     # Extract order items from the update if present
     update_items = data.pop('order_items', None)
     
+    status_change = {k: data.pop(k) for k in ('order_status', 'picker_id') if k in data}
+    data.pop('order_completed', None)
+    status_update = {}
+    if status_change:
+        if 'order_status' not in status_change:
+            status_change['order_status'] = current_data.get('order_status', OrderStatus.pending.value)
+        status_update = build_status_update(current_data, status_change)
+    
     # Update the main order data
     if data:
         current_data.update(data)
     
-    try:
-        # Validate the order data (without items for now)
-        temp_items = current_items if update_items is None else update_items
-        order_model = OrderModel.from_dict(current_data, temp_items)
-        
-        # Update the order document with validated data
-        order_doc_ref.update(order_model.to_dict())
-        
-        # If new order items were provided, handle them
-        if update_items is not None:
-            # Delete existing order items
-            for item_doc in order_doc_ref.collection('order_items').stream():
-                item_doc.reference.delete()
-            
-            # Add new order items
-            for item_data in update_items:
-                # Remove any id field as it's not part of the model
-                if 'id' in item_data:
-                    item_data.pop('id')
-                
-                # Validate item data
-                item_model = OrderItemModel(**item_data)
-                
-                # Add to Firestore
-                order_doc_ref.collection('order_items').add(item_model.to_dict())
-        
-        # Return the updated order with its items
-        updated_order = order_model.to_dict()
-        updated_order['id'] = order_id
-        
-        # Get the updated items from Firestore
-        items = []
-        for item_doc in order_doc_ref.collection('order_items').stream():
-            item = item_doc.to_dict()
-            item['id'] = item_doc.id
-            items.append(item)
-        updated_order['order_items'] = items
+    # Validate the order data (without items for now)
+    temp_items = current_items if update_items is None else update_items
+    order_model = OrderModel.from_dict(current_data, temp_items)
+    order_data = order_model.to_dict()
+    items = current_items
+    
+    # Items are rewritten when new ones are provided, or when the stored layout
+    # differs from the configured storage mode (migrating the order on write)
+    layout_changed = embedded != (ORDER_ITEMS_STORAGE == "embedded")
+    if update_items is not None or layout_changed:
+        # Validate all new items before touching the stored ones
+        item_models = []
+        for item_data in temp_items:
+            # Remove any id field as it's not part of the model
+            item_data = {k: v for k, v in item_data.items() if k != 'id'}
+            item_models.append(OrderItemModel(**item_data))
         
-        return jsonify(updated_order), 200
+        if len(current_item_docs) + len(item_models) + 1 > MAX_BATCH_WRITES:
+            raise OrderUpdateError("Too many order items to update in a single commit", 400)
         
+        # Replace the existing order items
+        items = stage_order_items(transaction, order_ref, order_data, item_models, current_item_docs)
+        if embedded and ORDER_ITEMS_STORAGE == "subcollection":
+            order_data['order_items'] = firestore.DELETE_FIELD
+    
+    # Status fields are only written when they were validated above
+    for field in ('order_status', 'picker_id', 'order_completed'):
+        order_data.pop(field, None)
+    order_data.update(status_update)
+    transaction.update(order_ref, order_data,
+                       option=db.write_option(last_update_time=order_doc.update_time))
+    
+    updated_order = order_model.to_dict()
+    updated_order.update(status_update)
+    updated_order['id'] = order_ref.id
+    updated_order['order_items'] = items
+    return updated_order
+
+# PUT update an existing order.
+@app.route('/orders/<order_id>', methods=['PUT'])
+def update_order(order_id):
+    data = request.get_json()
+    if not data:
+        abort(400, description="Missing JSON body")
+    
+    order_doc_ref = db.collection('orders').document(order_id)
+    try:
+        updated_order = apply_order_update(db.transaction(), order_doc_ref, data)
+    except OrderUpdateError as e:
+        return jsonify({"error": e.message}), e.code
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
+    except google_exceptions.FailedPrecondition:
+        return jsonify({"error": "Order was modified concurrently, please retry"}), 409
+    order_cache.invalidate(order_id)
+    
+    return jsonify(updated_order), 200
+
+# Error raised while validating or applying an order status change
+class StatusUpdateError(OrderUpdateError):
+    pass
+
+# Helper function to validate a requested status change against the order's
+# current state and return the fields that need to be written
+def build_status_update(current_data, data):
+    new_status = data.get('order_status')
+    if new_status not in {s.value for s in OrderStatus}:
+        raise StatusUpdateError(f"Invalid order_status: {new_status}", 400)
+    if 'picker_id' in data and data['picker_id'] is not None and not isinstance(data['picker_id'], str):
+        raise StatusUpdateError("picker_id must be a string or null", 400)
+
+    current_status = current_data.get('order_status', OrderStatus.pending.value)
+    if new_status == current_status:
+        # Repeating the current status is allowed, but it must not steal the order from its picker
+        if 'picker_id' in data and data['picker_id'] != current_data.get('picker_id'):
+            raise StatusUpdateError(f"Order is already {current_status}", 409)
+    elif not can_transition(current_status, new_status):
+        raise StatusUpdateError(f"Cannot change order status from {current_status} to {new_status}", 409)
+
+    picker_id = data['picker_id'] if 'picker_id' in data else current_data.get('picker_id')
+    if new_status == OrderStatus.assigned.value and not picker_id:
+        raise StatusUpdateError("picker_id is required to assign an order", 400)
+
+    update_data = {'order_status': new_status}
+    if 'picker_id' in data:
+        update_data['picker_id'] = data['picker_id']
+    # If status is completed, add completion timestamp
+    if new_status == OrderStatus.completed.value and current_status != new_status:
+        update_data['order_completed'] = datetime.now().isoformat()
+    return update_data
+
+# Reads only the status fields and writes inside one transaction, so concurrent
+# pickers cannot overwrite each other and no order items are loaded
+@firestore.transactional
+def apply_status_update(transaction, order_ref, data):
+    snapshot = order_ref.get(field_paths=['order_status', 'picker_id'], transaction=transaction)
+    if not snapshot.exists:
+        raise StatusUpdateError("Order not found", 404)
+
+    update_data = build_status_update(snapshot.to_dict(), data)
+    transaction.update(order_ref, update_data,
+                       option=db.write_option(last_update_time=snapshot.update_time))
+    return update_data
 
 # PATCH to update order status
 @app.route('/orders/<order_id>/status', methods=['PATCH'])
@@ -187,51 +809,94 @@ def update_order_status(order_id):
         abort(400, description="Request must include 'order_status'")
     
     order_doc_ref = db.collection('orders').document(order_id)
-    order_doc = order_doc_ref.get()
-    if not order_doc.exists:
-        abort(404, description="Order not found")
+    try:
+        update_data = apply_status_update(db.transaction(), order_doc_ref, data)
+    except StatusUpdateError as e:
+        return jsonify({"error": e.message}), e.code
+    except google_exceptions.FailedPrecondition:
+        return jsonify({"error": "Order was modified concurrently, please retry"}), 409
+    order_cache.invalidate(order_id)
     
-    # Get current data and update status
-    current_data = order_doc.to_dict()
-    current_data['order_status'] = data['order_status']
+    # Return success response
+    return jsonify({
+        'id': order_id,
+        'order_status': update_data['order_status'],
+        'message': f"Order status updated to {update_data['order_status']}"
+    }), 200
+
+# Applies many status changes in one transaction. Every order is validated on its own;
+# the legal changes are committed together and the rest are reported as failed.
+@firestore.transactional
+def apply_batch_status_update(transaction, updates):
+    refs = [db.collection('orders').document(update['order_id']) for update in updates]
+    snapshots = {
+        snapshot.id: snapshot
+        for snapshot in db.get_all(refs, field_paths=['order_status', 'picker_id'], transaction=transaction)
+    }
+
+    results = []
+    for order_ref, update in zip(refs, updates):
+        snapshot = snapshots.get(order_ref.id)
+        try:
+            if snapshot is None or not snapshot.exists:
+                raise StatusUpdateError("Order not found", 404)
+            update_data = build_status_update(snapshot.to_dict(), update)
+        except StatusUpdateError as e:
+            results.append({'id': order_ref.id, 'updated': False, 'code': e.code, 'error': e.message})
+            continue
+
+        transaction.update(order_ref, update_data,
+                           option=db.write_option(last_update_time=snapshot.update_time))
+        results.append({'id': order_ref.id, 'updated': True, 'code': 200,
+                        'order_status': update_data['order_status']})
+    return results
+
+# POST to update the status of many orders at once.
+# Body is either {"updates": [{"order_id", "order_status", "picker_id"?}, ...]}
+# or {"order_ids": [...], "order_status": ..., "picker_id"?} to apply the same change to every order.
+@app.route('/orders/status:batch', methods=['POST'])
+def batch_update_order_status():
+    data = request.get_json()
+    if not isinstance(data, dict):
+        abort(400, description="Missing JSON body")
     
-    # Only update picker_id if it's included in the request
-    if 'picker_id' in data:
-        current_data['picker_id'] = data['picker_id']
+    if 'updates' in data:
+        updates = data['updates']
+        if not isinstance(updates, list) or not all(isinstance(u, dict) for u in updates):
+            abort(400, description="'updates' must be a list of objects")
+    elif 'order_ids' in data and 'order_status' in data:
+        if not isinstance(data['order_ids'], list):
+            abort(400, description="'order_ids' must be a list")
+        shared = {k: v for k, v in data.items() if k in ('order_status', 'picker_id')}
+        updates = [{**shared, 'order_id': order_id} for order_id in data['order_ids']]
+    else:
+        abort(400, description="Request must include 'updates' or 'order_ids' and 'order_status'")
     
-    # If status is completed, add completion timestamp
-    if data['order_status'] == 'completed':
-        current_data['order_completed'] = datetime.now().isoformat()
+    if not updates:
+        abort(400, description="No orders to update")
+    if len(updates) > MAX_BATCH_WRITES:
+        abort(400, description=f"At most {MAX_BATCH_WRITES} orders can be updated at once")
+    
+    order_ids = [u.get('order_id') for u in updates]
+    if not all(isinstance(order_id, str) and order_id for order_id in order_ids):
+        abort(400, description="Every update must include an 'order_id'")
+    if len(set(order_ids)) != len(order_ids):
+        abort(400, description="Each order can only appear once per batch")
+    if not all('order_status' in u for u in updates):
+        abort(400, description="Every update must include 'order_status'")
     
     try:
-        # Validate with the current items
-        items = []
-        for item_doc in order_doc_ref.collection('order_items').stream():
-            item = item_doc.to_dict()
-            items.append(item)
-        
-        # Create model instance to validate
-        order_model = OrderModel.from_dict(current_data, items)
-        
-        # Update only the status field
-        update_data = {'order_status': data['order_status']}
-        if 'picker_id' in data:
-            update_data['picker_id'] = data['picker_id']
-            
-        if data['order_status'] == 'completed':
-            update_data['order_completed'] = current_data['order_completed']
-        
-        order_doc_ref.update(update_data)
-        
-        # Return success response
-        return jsonify({
-            'id': order_id,
-            'order_status': data['order_status'],
-            'message': f"Order status updated to {data['order_status']}"
-        }), 200
-        
-    except ValidationError as e:
-        return jsonify({"error": str(e)}), 400
+        results = apply_batch_status_update(db.transaction(), updates)
+    except google_exceptions.FailedPrecondition:
+        return jsonify({"error": "Orders were modified concurrently, please retry"}), 409
+    
+    order_cache.invalidate(*[r['id'] for r in results if r['updated']])
+    updated = sum(1 for r in results if r['updated'])
+    return jsonify({
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results
+    }), 200
 
 # DELETE an order by order_id.
 @app.route('/orders/<order_id>', methods=['DELETE'])
@@ -241,12 +906,14 @@ def delete_order(order_id):
     if not order_doc.exists:
         abort(404, description="Order not found")
     
-    # Delete all order items in the subcollection first
-    for item_doc in order_doc_ref.collection('order_items').stream():
-        item_doc.reference.delete()
-    
-    # Then delete the main order document
-    order_doc_ref.delete()
+    # Delete all order items and the main order document in one atomic commit
+    batch = db.batch()
+    if not has_embedded_items(order_doc.to_dict()):
+        for item_doc in order_doc_ref.collection('order_items').stream():
+            batch.delete(item_doc.reference)
+    batch.delete(order_doc_ref)
+    batch.commit()
+    order_cache.invalidate(order_id)
     
     return jsonify({
         "message": f"Order {order_id} and all its items deleted successfully"
@@ -255,48 +922,37 @@ def delete_order(order_id):
 # Optional: Add an endpoint to get all orders for a specific customer
 @app.route('/customers/<customer_id>/orders', methods=['GET'])
 def get_customer_orders(customer_id):
-    orders_ref = db.collection('orders').where('customer_id', '==', customer_id)
-    docs = orders_ref.stream()
-    
-    orders = []
-    for doc in docs:
-        order = doc.to_dict()
-        order['id'] = doc.id
-        
-        # Get order items
-        items = []
-        for item_doc in doc.reference.collection('order_items').stream():
-            item = item_doc.to_dict()
-            item['id'] = item_doc.id
-            items.append(item)
-        
-        order['order_items'] = items
-        orders.append(order)
-    
-    return jsonify(orders), 200
+    return list_orders(('customer_id', '==', customer_id))
 
 # Optional: Add an endpoint to get all orders assigned to a specific picker
 @app.route('/pickers/<picker_id>/orders', methods=['GET'])
 def get_picker_orders(picker_id):
-    orders_ref = db.collection('orders').where('picker_id', '==', picker_id)
-    docs = orders_ref.stream()
-    
-    orders = []
-    for doc in docs:
-        order = doc.to_dict()
-        order['id'] = doc.id
-        
-        # Get order items
-        items = []
-        for item_doc in doc.reference.collection('order_items').stream():
-            item = item_doc.to_dict()
-            item['id'] = item_doc.id
-            items.append(item)
-        
-        order['order_items'] = items
-        orders.append(order)
-    
-    return jsonify(orders), 200
+    return list_orders(('picker_id', '==', picker_id))
+
+# Helper function shared by the order count endpoints. Supports the same ?status=, ?since=
+# and ?include_archived= as the list endpoints, and counts with a Firestore count()
+# aggregation so no order documents are read.
+def count_orders(*filters):
+    filters = parse_order_filters(filters)
+    collections = ['orders', ARCHIVE_COLLECTION] if include_archived() else ['orders']
+    count = 0
+    for collection in collections:
+        query = db.collection(collection)
+        for field, op, value in filters:
+            query = query.where(field, op, value)
+        for result in query.count(alias='count').get():
+            count += result[0].value
+    return jsonify({"count": count}), 200
+
+# GET the number of orders of a customer, e.g. ?status=completed
+@app.route('/customers/<customer_id>/orders:count', methods=['GET'])
+def count_customer_orders(customer_id):
+    return count_orders(('customer_id', '==', customer_id))
+
+# GET the number of orders of a picker, e.g. ?status=completed
+@app.route('/pickers/<picker_id>/orders:count', methods=['GET'])
+def count_picker_orders(picker_id):
+    return count_orders(('picker_id', '==', picker_id))
 
 
 #updates location for the order 
@@ -343,6 +999,7 @@ def update_location(order_id):
             
         # Update the document
         order_ref.update(update_fields)
+        order_cache.invalidate(order_id)
         
         # Return success response with updated location
         return jsonify({
@@ -356,5 +1013,177 @@ def update_location(order_id):
         print(f"Error updating location: {str(e)}")
         return jsonify({"code": 500, "message": f"Server error: {str(e)}"}), 500
 
+# =========================================================================
+# Archiver: move old completed/cancelled orders into the archive collection
+# Usage: python atomic/order.py archive-orders [--older-than-days N] [--workers N]
+# =========================================================================
+def archive_order(doc):
+    """Copy one order (with embedded items) to the archive and remove it from orders in a single commit"""
+    order_data = doc.to_dict()
+    item_docs = []
+    if has_embedded_items(order_data):
+        items = order_data['order_items']
+    else:
+        item_docs = list(doc.reference.collection('order_items').stream())
+        items = [{**item_doc.to_dict(), 'id': item_doc.id} for item_doc in item_docs]
+    if len(item_docs) + 2 > MAX_BATCH_WRITES:
+        print(f"Order {doc.id} has too many items to archive in one commit")
+        return False
+
+    archived_order = {**order_data, 'order_items': items, 'archived_at': datetime.now().isoformat()}
+    batch = db.batch()
+    batch.set(db.collection(ARCHIVE_COLLECTION).document(doc.id), archived_order)
+    for item_doc in item_docs:
+        batch.delete(item_doc.reference)
+    # Skip orders that were written after we read them; the next run picks them up again
+    batch.delete(doc.reference, option=db.write_option(last_update_time=doc.update_time))
+    try:
+        batch.commit()
+    except google_exceptions.FailedPrecondition:
+        return False
+    order_cache.invalidate(doc.id)
+    return True
+
+def archive_orders(older_than_days=None, workers=8, page_size=200):
+    """Archive every completed or cancelled order that started before the cut-off"""
+    if older_than_days is None:
+        older_than_days = ORDER_ARCHIVE_AFTER_DAYS
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    archived = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            query = (db.collection('orders')
+                     .where('order_status', 'in', [OrderStatus.completed.value, OrderStatus.cancelled.value])
+                     .where('order_start', '<', cutoff)
+                     .limit(page_size))
+            docs = list(query.stream())
+            if not docs:
+                break
+            results = list(executor.map(archive_order, docs))
+            archived += sum(results)
+            # Orders that could not be archived would be returned again, so stop this run
+            if not any(results):
+                break
+    return archived
+
+class OrderArchiver:
+    """Runs archive_orders every ORDER_ARCHIVE_INTERVAL_SECONDS on a daemon thread"""
+    def __init__(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval_seconds <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                archived = archive_orders()
+                if archived:
+                    print(f"Archived {archived} orders")
+            except Exception as e:
+                print(f"Error archiving orders: {str(e)}")
+            time.sleep(self.interval_seconds)
+
+order_archiver = OrderArchiver(ORDER_ARCHIVE_INTERVAL_SECONDS)
+
+@app.before_request
+def ensure_order_archiver():
+    order_archiver.start()
+
+# =========================================================================
+# Migration: embed order items on the order document
+# Usage: python atomic/order.py migrate-embedded-items [--page-size N] [--workers N] [--restart]
+# =========================================================================
+def migrate_order_to_embedded(doc):
+    """Move one order's subcollection items onto the order document in a single commit"""
+    if has_embedded_items(doc.to_dict()):
+        return 'skipped'
+
+    item_docs = list(doc.reference.collection('order_items').stream())
+    if len(item_docs) + 1 > MAX_BATCH_WRITES:
+        print(f"Order {doc.id} has too many items to migrate in one commit")
+        return 'failed'
+
+    items = []
+    for item_doc in item_docs:
+        item = item_doc.to_dict()
+        item['id'] = item_doc.id
+        items.append(item)
+
+    batch = db.batch()
+    # The precondition makes the commit fail if the order was written after we read it,
+    # so concurrent writers in subcollection mode are never overwritten
+    batch.update(doc.reference, {'order_items': items},
+                 option=db.write_option(last_update_time=doc.update_time))
+    for item_doc in item_docs:
+        batch.delete(item_doc.reference)
+
+    try:
+        batch.commit()
+    except google_exceptions.FailedPrecondition:
+        print(f"Order {doc.id} changed during migration, run again with --restart to retry it")
+        return 'failed'
+    return 'migrated'
+
+def migrate_embedded_items(page_size=200, workers=8, restart=False):
+    """Embed the items of every order, resuming from the last checkpoint unless restart is set"""
+    checkpoint_ref = db.collection('migrations').document('order_items_embedded')
+    last_order_id = None
+    if not restart:
+        checkpoint = checkpoint_ref.get()
+        if checkpoint.exists:
+            last_order_id = checkpoint.to_dict().get('last_order_id')
+            print(f"Resuming after order {last_order_id}")
+
+    totals = {'migrated': 0, 'skipped': 0, 'failed': 0}
+    orders_ref = db.collection('orders')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            query = orders_ref.order_by(firestore.FieldPath.document_id()).limit(page_size)
+            if last_order_id:
+                query = query.start_after({'__name__': orders_ref.document(last_order_id)})
+            docs = list(query.stream())
+            if not docs:
+                break
+
+            for result in executor.map(migrate_order_to_embedded, docs):
+                totals[result] += 1
+
+            last_order_id = docs[-1].id
+            checkpoint_ref.set({
+                'last_order_id': last_order_id,
+                'updated_at': datetime.now().isoformat(),
+                'completed': False
+            })
+            print(f"Processed up to order {last_order_id}: {totals}")
+
+    checkpoint_ref.set({'completed': True, 'updated_at': datetime.now().isoformat()}, merge=True)
+    print(f"Migration finished: {totals}")
+    return totals
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5003, threaded=True)
+    if len(sys.argv) > 1 and sys.argv[1] == 'archive-orders':
+        parser = argparse.ArgumentParser(description="Move old completed and cancelled orders to the archive")
+        parser.add_argument('command')
+        parser.add_argument('--older-than-days', type=float, default=ORDER_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--workers', type=int, default=8)
+        args = parser.parse_args()
+        print(f"Archived {archive_orders(args.older_than_days, args.workers)} orders")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'migrate-embedded-items':
+        parser = argparse.ArgumentParser(description="Embed order items on their order documents")
+        parser.add_argument('command')
+        parser.add_argument('--page-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--restart', action='store_true', help="Ignore the saved checkpoint")
+        args = parser.parse_args()
+        migrate_embedded_items(page_size=args.page_size, workers=args.workers, restart=args.restart)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5003, threaded=True)
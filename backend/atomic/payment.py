@@ -2,19 +2,23 @@ import requests
 import json
 import firebase_admin
 from firebase_admin import credentials, firestore
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort
+from werkzeug.exceptions import HTTPException
+import argparse
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
 
 from pydantic import ValidationError
 from models.payment_model import PaymentModel
+from models.pricing import to_cents, from_cents
+from models.request_helpers import encode_page_token as encode_cursor, decode_page_token as decode_cursor
 
 # Initialize Flask app
 app = Flask(__name__)
 
 from flask_cors import CORS
-CORS(app)
+CORS(app, expose_headers=["X-Next-Page-Token"])
 
 # Initialize firebase
 if not firebase_admin._apps:
@@ -27,19 +31,165 @@ db = firestore.client()
 
 ORDER_SERVICE_URL = "http://localhost:5003"  # Order service URL
 
+# Largest page the payment list endpoints return
+MAX_PAGE_SIZE = int(os.getenv("PAYMENT_MAX_PAGE_SIZE", "100"))
+
+# Helpers for the opaque "page_token" cursor, keyed on (timestamp, id)
+def encode_page_token(doc):
+    return encode_cursor(doc, 'timestamp')
+
+def decode_page_token(token):
+    return decode_cursor(token, 'timestamp')
+
+def parse_timestamp(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        # Timestamps are stored as ISO strings, so compare in the same format
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        abort(400, description=f"'{name}' must be an ISO 8601 timestamp")
+
+# Helper function shared by the payment list endpoints. filters are (field, op, value) tuples.
+# Payments come newest first. Supports ?from=<iso> ?to=<iso> ?event_type=a,b ?limit=N ?page_token=...
+# Returns (payments, next_page_token); without ?limit every matching payment is returned.
+def list_payments(*filters):
+    filters = list(filters)
+    event_type = request.args.get('event_type')
+    if event_type:
+        event_types = [e.strip() for e in event_type.split(',') if e.strip()]
+        if len(event_types) == 1:
+            filters.append(('event_type', '==', event_types[0]))
+        elif event_types:
+            filters.append(('event_type', 'in', event_types))
+
+    start = parse_timestamp('from')
+    if start:
+        filters.append(('timestamp', '>=', start))
+    end = parse_timestamp('to')
+    if end:
+        filters.append(('timestamp', '<', end))
+
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(400, description="'limit' must be an integer")
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            abort(400, description=f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+
+    query = db.collection('payments')
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+    # Order by document id as a tie-breaker so the cursor is stable
+    query = query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+    query = query.order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+    page_token = request.args.get('page_token')
+    if page_token:
+        query = query.start_after(decode_page_token(page_token))
+    if limit is not None:
+        # Read one extra document to know whether another page exists
+        query = query.limit(limit + 1)
+    docs = list(query.stream())
+
+    next_page_token = None
+    if limit is not None and len(docs) > limit:
+        docs = docs[:limit]
+        next_page_token = encode_page_token(docs[-1])
+    return [doc.to_dict() for doc in docs], next_page_token
+
+# Per-customer payment aggregates, kept in step with the ledger by writing them in the
+# same batch as every payment create/delete. payment_summaries/<customer_id> holds running
+# counts and amounts (in cents) overall and by event_type; its "daily" subcollection holds
+# the same figures per day (YYYY-MM-DD).
+SUMMARY_COLLECTION = "payment_summaries"
+MAX_SUMMARY_DAYS = 366
+
+def stage_summary_update(batch, payment_data, sign=1):
+    """Add (sign=1) or remove (sign=-1) one payment from its customer's aggregates"""
+    amount_cents = to_cents(payment_data.get("payment_amount", 0)) * sign
+    event_type = payment_data.get("event_type", "Unknown")
+    figures = {"count": firestore.Increment(sign), "amount_cents": firestore.Increment(amount_cents)}
+    summary_ref = db.collection(SUMMARY_COLLECTION).document(payment_data["customer_id"])
+    batch.set(summary_ref, {
+        "customer_id": payment_data["customer_id"],
+        "count": firestore.Increment(sign),
+        "amount_cents": firestore.Increment(amount_cents),
+        "by_event_type": {event_type: figures},
+        "updated_at": datetime.now().isoformat()
+    }, merge=True)
+    day = str(payment_data.get("timestamp", ""))[:10] or datetime.now().date().isoformat()
+    batch.set(summary_ref.collection("daily").document(day), {
+        "date": day,
+        "count": firestore.Increment(sign),
+        "amount_cents": firestore.Increment(amount_cents),
+        "by_event_type": {event_type: figures}
+    }, merge=True)
+
+def rebuild_summaries():
+    """Recompute every customer's aggregates from the ledger. Returns the number of customers."""
+    summaries = {}
+    fields = ["customer_id", "event_type", "payment_amount", "timestamp"]
+    for doc in db.collection("payments").select(fields).stream():
+        payment = doc.to_dict()
+        if not payment.get("customer_id"):
+            continue
+        amount_cents = to_cents(payment.get("payment_amount", 0))
+        event_type = payment.get("event_type", "Unknown")
+        day = str(payment.get("timestamp", ""))[:10]
+        summary = summaries.setdefault(payment["customer_id"], {"total": {}, "daily": {}})
+        for bucket in (summary["total"], summary["daily"].setdefault(day, {})):
+            bucket["count"] = bucket.get("count", 0) + 1
+            bucket["amount_cents"] = bucket.get("amount_cents", 0) + amount_cents
+            by_type = bucket.setdefault("by_event_type", {}).setdefault(event_type, {"count": 0, "amount_cents": 0})
+            by_type["count"] += 1
+            by_type["amount_cents"] += amount_cents
+
+    # Writes are committed in batches of at most 500 (the Firestore limit)
+    batch, writes = db.batch(), 0
+    def stage(write, ref, *args):
+        nonlocal batch, writes
+        if writes == 500:
+            batch.commit()
+            batch, writes = db.batch(), 0
+        getattr(batch, write)(ref, *args)
+        writes += 1
+
+    # Remove daily buckets that no longer have payments, and the summaries of
+    # customers that have none left, before writing the recomputed figures
+    for summary_ref in db.collection(SUMMARY_COLLECTION).list_documents():
+        days = summaries.get(summary_ref.id, {"daily": {}})["daily"]
+        for day_ref in summary_ref.collection("daily").list_documents():
+            if day_ref.id not in days:
+                stage("delete", day_ref)
+        if summary_ref.id not in summaries:
+            stage("delete", summary_ref)
+
+    for customer_id, summary in summaries.items():
+        summary_ref = db.collection(SUMMARY_COLLECTION).document(customer_id)
+        stage("set", summary_ref, {
+            "customer_id": customer_id,
+            **summary["total"],
+            "updated_at": datetime.now().isoformat()
+        })
+        for day, bucket in summary["daily"].items():
+            stage("set", summary_ref.collection("daily").document(day), {"date": day, **bucket})
+    batch.commit()
+    return len(summaries)
+
 @app.route("/")
 def home():
     return "Payment Microservice (Using Firebase Firestore)"
 
-# Get all payments
+# Get all payments, newest first (see list_payments for filters and paging)
 @app.route("/payments", methods=['GET'])
 def get_all_payments():
-    payments_ref = db.collection('payments')
-    docs = payments_ref.stream()
-    payments = [doc.to_dict() for doc in docs]
+    payments, next_page_token = list_payments()
 
     if payments:
-        return jsonify({"code": 200, "data": payments}), 200
+        return jsonify({"code": 200, "data": payments, "next_page_token": next_page_token}), 200
     else:
         return jsonify({"code": 404, "message": "No payments found."}), 404
     
@@ -132,8 +282,11 @@ def create_payment_transaction():
         # Add the Firestore document ID to the payment data
         payment_data["payment_id"] = payment_ref.id
         
-        # Save to Firestore
-        payment_ref.set(payment_data)
+        # Save to Firestore together with the customer's aggregates
+        batch = db.batch()
+        batch.set(payment_ref, payment_data)
+        stage_summary_update(batch, payment_data)
+        batch.commit()
         
         return jsonify({
             "message": "Payment transaction created successfully.",
@@ -146,37 +299,83 @@ def create_payment_transaction():
     except Exception as e:
         return jsonify({"error": f"Error creating payment transaction: {str(e)}"}), 500
 
+# Reads and deletes a payment in one transaction, so concurrent deletes of the same
+# payment remove it from its customer's aggregates only once.
+# Returns the deleted payment, or None if it did not exist.
+@firestore.transactional
+def delete_payment_and_summary(transaction, payment_ref):
+    payment = payment_ref.get(transaction=transaction)
+    if not payment.exists:
+        return None
+    payment_data = payment.to_dict()
+    transaction.delete(payment_ref)
+    if payment_data.get("customer_id"):
+        stage_summary_update(transaction, payment_data, sign=-1)
+    return payment_data
+
 # Delete a payment
 @app.route("/payments/<paymentID>", methods=['DELETE'])
 def delete_payment(paymentID):
     payment_ref = db.collection('payments').document(paymentID)
-    payment = payment_ref.get()
-
-    if not payment.exists:
+    if delete_payment_and_summary(db.transaction(), payment_ref) is None:
         return jsonify({"code": 404, "message": f"Payment {paymentID} not found."}), 404
-
-    payment_ref.delete()
     return jsonify({"code": 200, "message": f"Payment {paymentID} has been deleted."}), 200
 
 # Get payments by customer ID
 @app.route("/payments/customer/<customer_id>", methods=['GET'])
 def get_payments_by_customer_id(customer_id):
     try:
-        # Query payments by customer_id
-        payments_ref = db.collection("payments")
-        query = payments_ref.where("customer_id", "==", customer_id)
-        payments = query.stream()
-        
-        # Collect payments from query and format them into a list
-        payment_list = []
-        for payment in payments:
-            payment_data = payment.to_dict()
-            payment_list.append(payment_data)
+        # Query payments by customer_id, newest first; the body stays a list and the
+        # cursor for the next page is returned in X-Next-Page-Token
+        payment_list, next_page_token = list_payments(("customer_id", "==", customer_id))
 
-        return jsonify(payment_list), 200
+        response = jsonify(payment_list)
+        if next_page_token:
+            response.headers['X-Next-Page-Token'] = next_page_token
+        return response, 200
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching payments: {e}")
         return jsonify({"error": "Could not fetch payments"}), 500
 
+# Get a customer's payment totals overall and by event_type (amounts in cents and dollars).
+# Optional ?days=N adds the daily buckets for the last N days, newest first.
+@app.route("/payments/customer/<customer_id>/summary", methods=['GET'])
+def get_customer_payment_summary(customer_id):
+    days = request.args.get('days')
+    if days is not None:
+        try:
+            days = int(days)
+        except ValueError:
+            abort(400, description="'days' must be an integer")
+        if days < 1 or days > MAX_SUMMARY_DAYS:
+            abort(400, description=f"'days' must be between 1 and {MAX_SUMMARY_DAYS}")
+
+    summary_ref = db.collection(SUMMARY_COLLECTION).document(customer_id)
+    doc = summary_ref.get()
+    summary = doc.to_dict() if doc.exists else {
+        "customer_id": customer_id, "count": 0, "amount_cents": 0, "by_event_type": {}
+    }
+    summary["amount"] = from_cents(summary.get("amount_cents", 0))
+    for figures in summary.get("by_event_type", {}).values():
+        figures["amount"] = from_cents(figures.get("amount_cents", 0))
+
+    if days:
+        first_day = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
+        query = (summary_ref.collection("daily")
+                 .where("date", ">=", first_day)
+                 .order_by("date", direction=firestore.Query.DESCENDING))
+        summary["daily"] = [bucket.to_dict() for bucket in query.stream()]
+
+    return jsonify(summary), 200
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5004, threaded=True)
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild-summaries':
+        # Run while no payments are being written; live writes keep the summaries current after that
+        parser = argparse.ArgumentParser(description="Recompute per-customer payment summaries from the ledger")
+        parser.add_argument('command')
+        parser.parse_args()
+        print(f"Rebuilt payment summaries for {rebuild_summaries()} customers")
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5004, threaded=True)
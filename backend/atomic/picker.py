@@ -1,11 +1,17 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, jsonify, abort, make_response
 from flask_cors import CORS
+import argparse
 import os
 import sys
+import threading
+import time
+from datetime import datetime
 from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as google_exceptions
 from pydantic import ValidationError
+from models.request_helpers import parse_fields, parse_batch_ids, batch_get_documents
 from models.picker_model import PickerModel
 
 # Add parent directory to path to resolve module imports
@@ -23,7 +29,7 @@ if not firebase_admin._apps:
 db = firestore.client()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Available-Version"])
 
 # TEST
 @app.route('/test', methods=['GET'])
@@ -42,9 +48,114 @@ def get_pickers():
         pickers.append(picker)
     return jsonify(pickers), 200
 
-# GET all Available pickers.
+# =========================================================================
+# Live index of available pickers, kept up to date by a snapshot listener on the
+# is_available == True query. Every change bumps the index version; pickers that leave
+# the set are remembered as tombstones so clients can ask for what changed since a version.
+# =========================================================================
+class AvailablePickerIndex:
+    def __init__(self, max_tombstones):
+        self._max_tombstones = max_tombstones
+        self._lock = threading.Lock()
+        self._pickers = {}     # picker_id -> (version, picker)
+        self._tombstones = {}  # picker_id -> version it became unavailable
+        self._version = 0
+        self._min_delta_version = 0  # oldest version a delta can still be served from
+        self._epoch = None
+        self._ready = False
+        self._watch = None
+
+    def is_healthy(self):
+        watch = self._watch
+        return self._ready and watch is not None and watch.is_active
+
+    def start(self):
+        with self._lock:
+            if self._watch is not None and self._watch.is_active:
+                return
+            if self._watch is not None:
+                print("Available picker listener stopped, restarting it")
+            self._pickers.clear()
+            self._tombstones.clear()
+            self._version = 0
+            self._min_delta_version = 0
+            self._epoch = str(int(time.time() * 1000))
+            self._ready = False
+            query = db.collection('pickers').where('is_available', '==', True)
+            self._watch = query.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            for change in changes:
+                picker_id = change.document.id
+                self._version += 1
+                if change.type.name == 'REMOVED':
+                    self._pickers.pop(picker_id, None)
+                    self._tombstones[picker_id] = self._version
+                else:
+                    picker = change.document.to_dict()
+                    picker['id'] = picker_id
+                    self._pickers[picker_id] = (self._version, picker)
+                    self._tombstones.pop(picker_id, None)
+            if len(self._tombstones) > self._max_tombstones:
+                # Drop the oldest half; deltas from before them are no longer possible
+                oldest = sorted(self._tombstones.items(), key=lambda item: item[1])
+                for picker_id, version in oldest[:len(oldest) // 2]:
+                    del self._tombstones[picker_id]
+                    self._min_delta_version = max(self._min_delta_version, version)
+            self._ready = True
+
+    def token(self, version):
+        return f"{self._epoch}-{version}"
+
+    def snapshot(self):
+        """Return (available pickers, token)"""
+        with self._lock:
+            return [picker for _, picker in self._pickers.values()], self.token(self._version)
+
+    def delta(self, token):
+        """Return (changed pickers, removed picker ids, next token), or None if the client has to resync"""
+        with self._lock:
+            epoch, _, version = token.partition('-')
+            if epoch != self._epoch or not version.isdigit():
+                return None
+            version = int(version)
+            if version > self._version or version < self._min_delta_version:
+                return None
+            changed = [picker for changed_at, picker in self._pickers.values() if changed_at > version]
+            removed = [picker_id for picker_id, removed_at in self._tombstones.items() if removed_at > version]
+            return changed, removed, self.token(self._version)
+
+available_pickers = AvailablePickerIndex(max_tombstones=int(os.getenv("AVAILABLE_PICKER_TOMBSTONES", "1000")))
+
+@app.before_request
+def ensure_available_picker_listener():
+    try:
+        available_pickers.start()
+    except Exception as e:
+        print(f"Could not start available picker listener: {str(e)}")
+
+# GET all Available pickers. Served from the live index; the index version is returned in
+# X-Available-Version. With ?since=<version> only the pickers that changed or became
+# unavailable since then are returned: {"changed": [...], "removed": [ids], "next_token": ...}.
 @app.route('/pickers/available', methods=['GET'])
 def get_available_pickers():
+    since = request.args.get('since')
+    if available_pickers.is_healthy():
+        if since:
+            result = available_pickers.delta(since)
+            if result is None:
+                return jsonify({"error": "Version expired, re-fetch available pickers"}), 410
+            changed, removed, next_token = result
+            return jsonify({"changed": changed, "removed": removed, "next_token": next_token}), 200
+        pickers, token = available_pickers.snapshot()
+        response = make_response(jsonify(pickers), 200)
+        response.headers['X-Available-Version'] = token
+        return response
+
+    # Listener is down or still loading: deltas are not possible, answer from Firestore
+    if since:
+        return jsonify({"error": "Version expired, re-fetch available pickers"}), 410
     pickers_ref = db.collection('pickers').where("is_available", "==", True)
     docs = pickers_ref.stream()
     pickers = []
@@ -54,6 +165,17 @@ def get_available_pickers():
         pickers.append(picker)
     return jsonify(pickers), 200
 
+# Upper bound for the number of pickers fetched by one batchGet request
+MAX_BATCH_GET = int(os.getenv("PICKER_MAX_BATCH_GET", "300"))
+
+# POST to fetch many pickers by ID in one request.
+# Body: {"picker_ids": [...]}; optional ?fields=a,b returns only those fields (plus id)
+@app.route('/pickers:batchGet', methods=['POST'])
+def batch_get_pickers():
+    ids = parse_batch_ids(request.get_json(), 'picker_ids', MAX_BATCH_GET, 'pickers')
+    records, missing = batch_get_documents(db, 'pickers', ids, parse_fields())
+    return jsonify({"pickers": records, "missing": missing}), 200
+
 # GET a specific picker by document ID (which is now the Firebase UID).
 @app.route('/pickers/<picker_id>', methods=['GET'])
 def get_picker(picker_id):
@@ -82,16 +204,33 @@ def get_picker_credits(picker_id):
         "picker_credits": picker_data.get('picker_credits', 0)
     }), 200
 
+class CreditError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+# Helper function to add/subtract credits in one transaction. Only the credits field is
+# read and written, so concurrent updates cannot overwrite each other.
+# Returns (previous_credits, new_credits).
+@firestore.transactional
+def adjust_picker_credits(transaction, doc_ref, amount, allow_negative=False):
+    doc = doc_ref.get(field_paths=['picker_credits'], transaction=transaction)
+    if not doc.exists:
+        raise CreditError("Picker not found", 404)
+
+    current_credits = (doc.to_dict() or {}).get('picker_credits', 0)
+    new_credits = round(current_credits + amount, 2)
+    if new_credits < 0 and not allow_negative:
+        raise CreditError("Operation would result in negative credits", 400)
+
+    transaction.update(doc_ref, {'picker_credits': new_credits})
+    return current_credits, new_credits
+
 # PATCH to update picker credits
 @app.route('/pickers/<picker_id>/credits', methods=['PATCH'])
 def update_picker_credits(picker_id):
     """Update a picker's credit balance by adding/subtracting the specified amount"""
-    doc_ref = db.collection('pickers').document(picker_id)
-    doc = doc_ref.get()
-    
-    if not doc.exists:
-        abort(404, description="Picker not found")
-    
     data = request.get_json()
     if not data or 'amount' not in data:
         abort(400, description="Request must include 'amount' field")
@@ -99,39 +238,194 @@ def update_picker_credits(picker_id):
     try:
         # Get the amount to add/subtract (can be negative for deductions)
         amount = float(data['amount'])
-        
-        # Get the current picker data
-        current_data = doc.to_dict()
-        current_credits = current_data.get('picker_credits', 0)
-        
-        # Calculate new credit balance
-        new_credits = current_credits + amount
-        
-        # Prevent negative balance if needed
-        if new_credits < 0 and not data.get('allow_negative', False):
-            abort(400, description="Operation would result in negative credits")
-        
-        # Update the picker's credits
-        current_data.update({'picker_credits': new_credits})
-        
-        # Validate the updated data with Pydantic
-        updated_picker = PickerModel(**current_data)
-        
-        # Update just the credits field in Firestore
-        doc_ref.update({'picker_credits': new_credits})
-        
-        # Return success response with updated credit information
-        return jsonify({
-            "picker_id": picker_id,
-            "previous_credits": current_credits,
-            "amount_changed": amount,
-            "new_credits": new_credits
-        }), 200
-        
-    except ValueError:
+    except (ValueError, TypeError):
         abort(400, description="Amount must be a number")
-    except ValidationError as e:
-        return jsonify({"error": str(e)}), 400
+    
+    doc_ref = db.collection('pickers').document(picker_id)
+    try:
+        current_credits, new_credits = adjust_picker_credits(
+            db.transaction(), doc_ref, amount, data.get('allow_negative', False)
+        )
+    except CreditError as e:
+        abort(e.code, description=e.message)
+    
+    # Return success response with updated credit information
+    return jsonify({
+        "picker_id": picker_id,
+        "previous_credits": current_credits,
+        "amount_changed": amount,
+        "new_credits": new_credits
+    }), 200
+
+# =========================================================================
+# Picker earnings: per-delivery earnings are appended to the picker_earnings collection
+# (one document per entry, so recording an earning never touches the picker document) and
+# settled into picker_credits in batched transactions by a background settler.
+# =========================================================================
+EARNINGS_COLLECTION = "picker_earnings"
+# How often the settler runs; 0 disables the background thread
+EARNINGS_SETTLE_INTERVAL_SECONDS = float(os.getenv("PICKER_EARNINGS_SETTLE_INTERVAL_SECONDS", "60"))
+# Entries settled per transaction (each entry is one write, plus one for the picker)
+EARNINGS_SETTLE_BATCH_SIZE = 400
+
+def unsettled_earnings_query(picker_id):
+    return (db.collection(EARNINGS_COLLECTION)
+            .where('picker_id', '==', picker_id)
+            .where('settled', '==', False))
+
+# POST to record an earning for a picker: {"amount_cents": 250, "order_id": "..."}
+# or {"amount": 2.50}. With an order_id the entry is keyed by it, so retries are no-ops.
+@app.route('/pickers/<picker_id>/earnings', methods=['POST'])
+def record_picker_earning(picker_id):
+    data = request.get_json()
+    if not data or ('amount_cents' not in data and 'amount' not in data):
+        abort(400, description="Request must include 'amount_cents' or 'amount' field")
+    
+    try:
+        if 'amount_cents' in data:
+            amount_cents = int(data['amount_cents'])
+        else:
+            amount_cents = int(round(float(data['amount']) * 100))
+    except (ValueError, TypeError):
+        abort(400, description="Amount must be a number")
+    if amount_cents <= 0:
+        abort(400, description="Amount must be greater than zero")
+    
+    # Entries for unknown pickers could never be settled
+    if not db.collection('pickers').document(picker_id).get(field_paths=['picker_credits']).exists:
+        abort(404, description="Picker not found")
+    
+    order_id = data.get('order_id')
+    collection = db.collection(EARNINGS_COLLECTION)
+    entry_ref = collection.document(f"{picker_id}_{order_id}") if order_id else collection.document()
+    entry = {
+        'picker_id': picker_id,
+        'order_id': order_id,
+        'amount_cents': amount_cents,
+        'settled': False,
+        'created_at': datetime.now().isoformat()
+    }
+    try:
+        entry_ref.create(entry)
+    except google_exceptions.AlreadyExists:
+        return jsonify({"message": "Earning already recorded", "id": entry_ref.id}), 200
+    
+    entry['id'] = entry_ref.id
+    return jsonify(entry), 201
+
+# Helper function to move up to EARNINGS_SETTLE_BATCH_SIZE unsettled entries into the
+# picker's credits in one transaction. Returns the number of entries processed.
+# Entries of a picker that has been deleted are marked settled=None (orphaned) so the
+# settler stops picking them up.
+@firestore.transactional
+def settle_earnings_batch(transaction, picker_id):
+    picker_ref = db.collection('pickers').document(picker_id)
+    entries = list(unsettled_earnings_query(picker_id)
+                   .limit(EARNINGS_SETTLE_BATCH_SIZE)
+                   .stream(transaction=transaction))
+    if not entries:
+        return 0
+    picker_doc = picker_ref.get(field_paths=['picker_credits'], transaction=transaction)
+    if not picker_doc.exists:
+        orphaned_at = datetime.now().isoformat()
+        for entry in entries:
+            transaction.update(entry.reference, {'settled': None, 'orphaned_at': orphaned_at})
+        print(f"Marked {len(entries)} earnings of missing picker {picker_id} as orphaned")
+        return len(entries)
+
+    settled_cents = sum(entry.get('amount_cents') for entry in entries)
+    current_credits = (picker_doc.to_dict() or {}).get('picker_credits', 0)
+    transaction.update(picker_ref, {'picker_credits': round(current_credits + settled_cents / 100, 2)})
+    settled_at = datetime.now().isoformat()
+    for entry in entries:
+        transaction.update(entry.reference, {'settled': True, 'settled_at': settled_at})
+    return len(entries)
+
+def settle_picker_earnings(picker_id):
+    settled = 0
+    while True:
+        count = settle_earnings_batch(db.transaction(), picker_id)
+        settled += count
+        if count < EARNINGS_SETTLE_BATCH_SIZE:
+            return settled
+
+def settle_all_earnings():
+    """Settle every picker with unsettled earnings. Returns the number of entries settled."""
+    picker_ids = {
+        doc.get('picker_id')
+        for doc in db.collection(EARNINGS_COLLECTION)
+                     .where('settled', '==', False)
+                     .select(['picker_id'])
+                     .stream()
+    }
+    return sum(settle_picker_earnings(picker_id) for picker_id in picker_ids)
+
+class EarningsSettler:
+    """Runs settle_all_earnings every EARNINGS_SETTLE_INTERVAL_SECONDS on a daemon thread"""
+    def __init__(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval_seconds <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                settled = settle_all_earnings()
+                if settled:
+                    print(f"Settled {settled} picker earnings")
+            except Exception as e:
+                print(f"Error settling picker earnings: {str(e)}")
+            time.sleep(self.interval_seconds)
+
+earnings_settler = EarningsSettler(EARNINGS_SETTLE_INTERVAL_SECONDS)
+
+@app.before_request
+def ensure_earnings_settler():
+    earnings_settler.start()
+
+# Helper function to read settled credits and pending earnings from one consistent snapshot
+@firestore.transactional
+def read_picker_balance(transaction, picker_id):
+    picker_doc = db.collection('pickers').document(picker_id).get(
+        field_paths=['picker_credits'], transaction=transaction
+    )
+    if not picker_doc.exists:
+        return None
+    pending = list(unsettled_earnings_query(picker_id).select(['amount_cents']).stream(transaction=transaction))
+    return (picker_doc.to_dict() or {}).get('picker_credits', 0), pending
+
+# GET a picker's settled credits plus earnings that are not settled yet
+@app.route('/pickers/<picker_id>/earnings', methods=['GET'])
+def get_picker_earnings(picker_id):
+    balance = read_picker_balance(db.transaction(read_only=True), picker_id)
+    if balance is None:
+        abort(404, description="Picker not found")
+    
+    settled_credits, pending = balance
+    pending_cents = sum(entry.get('amount_cents') for entry in pending)
+    return jsonify({
+        "picker_id": picker_id,
+        "settled_credits": settled_credits,
+        "pending_cents": pending_cents,
+        "pending_entries": len(pending),
+        "balance": round(settled_credits + pending_cents / 100, 2)
+    }), 200
+
+# POST to settle a picker's pending earnings now instead of waiting for the settler
+@app.route('/pickers/<picker_id>/earnings:settle', methods=['POST'])
+def settle_picker_earnings_now(picker_id):
+    if not db.collection('pickers').document(picker_id).get().exists:
+        abort(404, description="Picker not found")
+    return jsonify({"picker_id": picker_id, "settled_entries": settle_picker_earnings(picker_id)}), 200
 
 # POST create a new picker.
 @app.route('/pickers', methods=['POST'])
@@ -243,4 +537,10 @@ def delete_picker(picker_id):
     return jsonify({"message": f"Picker {picker_id} deleted"}), 200
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'settle-earnings':
+        parser = argparse.ArgumentParser(description="Settle pending picker earnings into picker credits")
+        parser.add_argument('command')
+        parser.parse_args()
+        print(f"Settled {settle_all_earnings()} picker earnings")
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
@@ -1,11 +1,24 @@
 from flask import Flask, request, jsonify, abort
 from flask_cors import CORS
+import argparse
+import bisect
+import json
 import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import requests
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions, SendMode
 from pydantic import ValidationError
 from models.stall_model import StallModel, MenuItemModel
+from models.pricing import PricingError, build_price_index, quote_order
+from models.request_helpers import parse_fields as parse_request_fields, project
 
 load_dotenv()  # Loads the .env file
 
@@ -21,6 +34,322 @@ db = firestore.client()
 app = Flask(__name__)
 CORS(app)
 
+# Helper for the optional ?fields=a,b,c sparse projection on read endpoints.
+# "menu" must be requested for the menu to be included.
+def parse_fields():
+    return parse_request_fields(whole_fields=("menu",))
+
+
+# Helper function to read a stall's "menu" subcollection
+def get_menu_items(stall_ref):
+    menu_items = []
+    for menu_doc in stall_ref.collection("menu").stream():
+        menu_item = menu_doc.to_dict()
+        menu_item["id"] = menu_doc.id
+        menu_items.append(menu_item)
+    return menu_items
+
+
+# Denormalized catalog documents: stall_catalog/<stall_id> holds the stall fields, its menu
+# embedded under "menu" and a "version" that is bumped on every sync. Every stall and
+# menu write re-syncs the document, so reading a stall with its menu is one document get.
+CATALOG_COLLECTION = "stall_catalog"
+CATALOG_META_FIELDS = ("version", "updated_at")
+
+
+def catalog_doc_to_stall(doc):
+    stall_data = {k: v for k, v in doc.to_dict().items() if k not in CATALOG_META_FIELDS}
+    stall_data["id"] = doc.id
+    stall_data.setdefault("menu", [])
+    return stall_data
+
+
+@firestore.transactional
+def sync_catalog_doc(transaction, stall_id):
+    """Rewrite one stall's catalog document from the stall and its menu.
+    Returns the stall dict with its menu, or None if the stall no longer exists."""
+    stall_ref = db.collection("stalls").document(stall_id)
+    catalog_ref = db.collection(CATALOG_COLLECTION).document(stall_id)
+    stall_doc = stall_ref.get(transaction=transaction)
+    menu_docs = list(stall_ref.collection("menu").stream(transaction=transaction))
+    catalog_doc = catalog_ref.get(transaction=transaction)
+
+    if not stall_doc.exists:
+        if catalog_doc.exists:
+            transaction.delete(catalog_ref)
+        return None
+
+    menu = []
+    for menu_doc in menu_docs:
+        menu_item = menu_doc.to_dict()
+        menu_item["id"] = menu_doc.id
+        menu.append(menu_item)
+    version = (catalog_doc.to_dict() or {}).get("version", 0) + 1 if catalog_doc.exists else 1
+    transaction.set(catalog_ref, {
+        **stall_doc.to_dict(),
+        "menu": menu,
+        "version": version,
+        "updated_at": datetime.now().isoformat(),
+    })
+
+    stall_data = stall_doc.to_dict()
+    stall_data["id"] = stall_id
+    stall_data["menu"] = menu
+    return stall_data
+
+
+def rebuild_catalog_docs(workers=16):
+    """Repair: re-sync every stall's catalog document in parallel and drop orphaned ones"""
+    stall_ids = [doc.id for doc in db.collection("stalls").select([firestore.FieldPath.document_id()]).stream()]
+    catalog_ids = [doc.id for doc in db.collection(CATALOG_COLLECTION).select([firestore.FieldPath.document_id()]).stream()]
+    # Syncing a missing stall deletes its catalog document
+    ids = list(dict.fromkeys(stall_ids + catalog_ids))
+    if ids:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids)))) as executor:
+            list(executor.map(lambda stall_id: sync_catalog_doc(db.transaction(), stall_id), ids))
+    return len(stall_ids)
+
+
+# Inverted index over the catalog used by GET /stalls/search. Every menu item is a search
+# entry keyed by (stall_id, food_id) and indexed by the words of its food_name,
+# food_description and food_category plus its stall's cuisines. The index is immutable:
+# with_stall() builds the next index by re-indexing one stall and sharing everything else.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+
+
+class SearchIndex:
+    def __init__(self, postings, entries, by_stall):
+        self.postings = postings  # token -> frozenset of entry keys
+        self.entries = entries  # entry key -> (menu item, lowercased stall cuisines, tokens)
+        self.by_stall = by_stall  # stall_id -> tuple of entry keys
+        self.tokens = sorted(postings)  # for prefix lookups
+
+    @classmethod
+    def build(cls, stalls):
+        index = cls({}, {}, {})
+        for stall_id, stall_data in stalls.items():
+            index._add_stall(stall_id, stall_data)
+        index.tokens = sorted(index.postings)
+        return index
+
+    def with_stall(self, stall_id, stall_data):
+        index = SearchIndex(dict(self.postings), dict(self.entries), dict(self.by_stall))
+        for key in index.by_stall.pop(stall_id, ()):
+            for token in index.entries.pop(key)[2]:
+                remaining = index.postings[token] - {key}
+                if remaining:
+                    index.postings[token] = remaining
+                else:
+                    del index.postings[token]
+        if stall_data is not None:
+            index._add_stall(stall_id, stall_data)
+        index.tokens = sorted(index.postings)
+        return index
+
+    def _add_stall(self, stall_id, stall_data):
+        cuisines = frozenset(c.lower() for c in stall_data.get("cuisines") or [])
+        cuisine_tokens = {t for c in cuisines for t in tokenize(c)}
+        keys = []
+        for menu_item in stall_data.get("menu", []):
+            key = (stall_id, menu_item["id"])
+            tokens = frozenset(
+                tokenize(menu_item.get("food_name"))
+                + tokenize(menu_item.get("food_description"))
+                + tokenize(menu_item.get("food_category"))
+            ) | cuisine_tokens
+            self.entries[key] = (menu_item, cuisines, tokens)
+            for token in tokens:
+                self.postings[token] = self.postings.get(token, frozenset()) | {key}
+            keys.append(key)
+        self.by_stall[stall_id] = tuple(keys)
+
+    def match(self, term):
+        """Entry keys with a token equal to or starting with term"""
+        keys = set()
+        position = bisect.bisect_left(self.tokens, term)
+        while position < len(self.tokens) and self.tokens[position].startswith(term):
+            keys |= self.postings[self.tokens[position]]
+            position += 1
+        return keys
+
+    def search(self, q=None, cuisine=None, category=None, min_price=None, max_price=None):
+        """Return matching (stall_id, menu item) pairs; every word of q must match"""
+        terms = tokenize(q)
+        if terms:
+            keys = None
+            for term in terms:
+                keys = self.match(term) if keys is None else keys & self.match(term)
+                if not keys:
+                    return []
+        else:
+            keys = self.entries.keys()
+
+        results = []
+        for key in keys:
+            menu_item, cuisines, _ = self.entries[key]
+            price = menu_item.get("food_price", 0)
+            if cuisine and cuisine.lower() not in cuisines:
+                continue
+            if category and (menu_item.get("food_category") or "").lower() != category.lower():
+                continue
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            results.append((key[0], menu_item))
+        return results
+
+
+# In-memory stall catalog (every stall with its menu) that serves all catalog reads.
+# It is warmed on startup from the catalog documents; each write route re-syncs the
+# stall it touched and swaps in a new snapshot with a bumped version, so readers never
+# see a half-updated catalog. Writes made elsewhere (another instance, the import CLI)
+# reach the snapshot through the catalog document listener below.
+class CatalogSnapshot:
+    def __init__(self, version, stalls, index=None, prices=None):
+        self.version = version
+        self.stalls = stalls  # stall_id -> stall dict including "menu"
+        self.index = index if index is not None else SearchIndex.build(stalls)
+        # stall_id -> menu price index used for order quotes
+        self.prices = prices if prices is not None else {
+            stall_id: build_price_index(stall_data.get("menu", [])) for stall_id, stall_data in stalls.items()
+        }
+
+    def with_stall(self, stall_id, stall_data):
+        """Return the next snapshot with one stall replaced (or removed when stall_data is None)"""
+        stalls = dict(self.stalls)
+        prices = dict(self.prices)
+        if stall_data is None:
+            stalls.pop(stall_id, None)
+            prices.pop(stall_id, None)
+        else:
+            stalls[stall_id] = stall_data
+            prices[stall_id] = build_price_index(stall_data.get("menu", []))
+        return CatalogSnapshot(self.version + 1, stalls, self.index.with_stall(stall_id, stall_data), prices)
+
+
+catalog = None
+# Serialises rebuilds; readers only dereference the current snapshot and never lock
+catalog_lock = threading.Lock()
+
+
+def load_stall(stall_id):
+    """Read a stall and its menu with a single catalog document get, or None if it does not exist"""
+    doc = db.collection(CATALOG_COLLECTION).document(stall_id).get()
+    if doc.exists:
+        return catalog_doc_to_stall(doc)
+    # No catalog document yet (e.g. data written before catalog docs existed): build it now
+    return sync_catalog_doc(db.transaction(), stall_id)
+
+
+def warm_catalog():
+    """Rebuild the whole in-memory catalog from the catalog documents and swap it in"""
+    global catalog
+    with catalog_lock:
+        docs = list(db.collection(CATALOG_COLLECTION).stream())
+        if not docs and any(True for _ in db.collection("stalls").limit(1).stream()):
+            # First start after catalog documents were introduced
+            rebuild_catalog_docs()
+            docs = list(db.collection(CATALOG_COLLECTION).stream())
+        stalls = {doc.id: catalog_doc_to_stall(doc) for doc in docs}
+        catalog = CatalogSnapshot(catalog.version + 1 if catalog else 1, stalls)
+        return catalog
+
+
+def refresh_catalog(stall_id):
+    """Re-sync one stall's catalog document after a write, swap in a new snapshot and return the stall"""
+    global catalog
+    with catalog_lock:
+        stall_data = sync_catalog_doc(db.transaction(), stall_id)
+        if catalog is None:
+            # Not warmed yet, the next read loads everything anyway
+            return stall_data
+        catalog = catalog.with_stall(stall_id, stall_data)
+    return stall_data
+
+
+def get_catalog():
+    snapshot = catalog
+    if snapshot is None:
+        snapshot = warm_catalog()
+    return snapshot
+
+
+def get_catalog_stall(stall_id):
+    """Return (snapshot, stall) from the catalog, loading the stall if this process has not
+    seen it yet. The stall is None if it does not exist."""
+    global catalog
+    snapshot = get_catalog()
+    stall_data = snapshot.stalls.get(stall_id)
+    if stall_data is None:
+        stall_data = load_stall(stall_id)
+        if stall_data is not None:
+            with catalog_lock:
+                catalog = catalog.with_stall(stall_id, stall_data)
+                snapshot = catalog
+    return snapshot, stall_data
+
+
+# Snapshot listener on the catalog documents. Every catalog write bumps the document's
+# version, so each change it reports is applied to the in-memory snapshot unless this
+# process already holds the same stall (e.g. after its own refresh_catalog).
+class CatalogListener:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watch = None
+
+    def is_healthy(self):
+        watch = self._watch
+        return watch is not None and watch.is_active
+
+    def start(self):
+        with self._lock:
+            if self.is_healthy():
+                return
+            if self._watch is not None:
+                print("Stall catalog listener stopped, restarting it")
+            self._watch = db.collection(CATALOG_COLLECTION).on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        global catalog
+        with catalog_lock:
+            if catalog is None:
+                # Not warmed yet, the first read loads everything anyway
+                return
+            snapshot = catalog
+            for change in changes:
+                stall_id = change.document.id
+                if change.type.name == "REMOVED":
+                    if stall_id in snapshot.stalls:
+                        snapshot = snapshot.with_stall(stall_id, None)
+                    continue
+                stall_data = catalog_doc_to_stall(change.document)
+                if snapshot.stalls.get(stall_id) != stall_data:
+                    snapshot = snapshot.with_stall(stall_id, stall_data)
+            catalog = snapshot
+
+
+catalog_listener = CatalogListener()
+
+
+@app.before_request
+def ensure_catalog_listener():
+    try:
+        catalog_listener.start()
+    except Exception as e:
+        print(f"Could not start stall catalog listener: {str(e)}")
+
+
+def catalog_response(snapshot, payload, status=200):
+    """Respond with payload, tagged with the version of the snapshot it was read from"""
+    response = jsonify(payload)
+    response.headers["X-Catalog-Version"] = str(snapshot.version)
+    return response, status
+
 # TEST
 @app.route('/test', methods=['GET'])
 def test():
@@ -29,42 +358,136 @@ def test():
 # GET all food stalls with their menus.
 @app.route("/stalls", methods=["GET"])
 def get_stalls():
-    stalls_ref = db.collection("stalls")
-    docs = stalls_ref.stream()
-    stalls = []
-    for doc in docs:
-        stall_data = doc.to_dict()
-        stall_data["id"] = doc.id
-        # Retrieve menu items as documents in the subcollection "menu".
-        menu_docs = doc.reference.collection("menu").stream()
-        menu_items = []
-        for menu_doc in menu_docs:
-            menu_item = menu_doc.to_dict()
-            menu_item["id"] = menu_doc.id
-            menu_items.append(menu_item)
-        stall_data["menu"] = menu_items
-        stalls.append(stall_data)
-    return jsonify(stalls), 200
+    fields = parse_fields()
+    snapshot = get_catalog()
+    stalls = list(snapshot.stalls.values())
+    if fields:
+        stalls = [project(stall_data, fields) for stall_data in stalls]
+    return catalog_response(snapshot, stalls)
+
+
+# GET search over stall menus: ?q=words (prefix matching) &cuisine= &category= &min_price= &max_price=
+# Returns matching stalls (without their full menu) with the matching items under "menu".
+@app.route("/stalls/search", methods=["GET"])
+def search_stalls():
+    prices = {}
+    for name in ("min_price", "max_price"):
+        value = request.args.get(name)
+        if value is not None:
+            try:
+                prices[name] = float(value)
+            except ValueError:
+                abort(400, description=f"'{name}' must be a number")
+
+    snapshot = get_catalog()
+    matches = snapshot.index.search(
+        q=request.args.get("q"),
+        cuisine=request.args.get("cuisine"),
+        category=request.args.get("category"),
+        **prices,
+    )
+
+    results = {}
+    for stall_id, menu_item in matches:
+        stall_data = snapshot.stalls.get(stall_id)
+        if stall_data is None:
+            continue
+        if stall_id not in results:
+            results[stall_id] = {k: v for k, v in stall_data.items() if k != "menu"}
+            results[stall_id]["menu"] = []
+        results[stall_id]["menu"].append(menu_item)
+
+    # Stalls with the most matching items first, then by rating
+    stalls = sorted(results.values(), key=lambda st: (-len(st["menu"]), -st.get("rating", 0)))
+    for stall_data in stalls:
+        stall_data["menu"].sort(key=lambda item: item.get("food_price", 0))
+    return catalog_response(snapshot, stalls)
 
 
 # GET a specific food stall by stall_id.
 @app.route("/stalls/<stall_id>", methods=["GET"])
 def get_stall(stall_id):
-    doc_ref = db.collection("stalls").document(stall_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    fields = parse_fields()
+    snapshot, stall_data = get_catalog_stall(stall_id)
+    if stall_data is None:
         abort(404, description="Food stall not found")
-    stall_data = doc.to_dict()
-    stall_data["id"] = doc.id
-    # Get the stall's menu (from the "menu" subcollection)
-    menu_docs = doc_ref.collection("menu").stream()
-    menu_items = []
-    for menu_doc in menu_docs:
-        menu_item = menu_doc.to_dict()
-        menu_item["id"] = menu_doc.id
-        menu_items.append(menu_item)
-    stall_data["menu"] = menu_items
-    return jsonify(stall_data), 200
+    return catalog_response(snapshot, project(stall_data, fields) if fields else stall_data)
+
+
+# The storefront lists stalls and menus from the external FoodStallAPI, whose stall ids
+# are not Firestore stall ids. Quotes for stalls that are not in this catalog are priced
+# against that API's menu instead, so carts built from it can still be checked out.
+FOOD_STALL_API_URL = os.getenv(
+    "FOOD_STALL_API_URL", "https://personal-dcwqxa6n.outsystemscloud.com/SMUlivery/rest/FoodStallAPI"
+)
+FOOD_STALL_API_TIMEOUT_SECONDS = float(os.getenv("FOOD_STALL_API_TIMEOUT_SECONDS", "10"))
+# How long a FoodStallAPI menu is reused for quotes; 0 fetches it for every quote
+FOOD_STALL_API_CACHE_SECONDS = float(os.getenv("FOOD_STALL_API_CACHE_SECONDS", "60"))
+food_stall_prices = {}  # stall_id -> (expires_at, price index, delivery fee)
+food_stall_prices_lock = threading.Lock()
+
+
+def load_food_stall_prices(stall_id):
+    """Return (price index, delivery fee) for a FoodStallAPI stall, or None if it has no such stall.
+    Raises requests.RequestException, KeyError or ValueError if the API cannot be read."""
+    with food_stall_prices_lock:
+        cached = food_stall_prices.get(stall_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1], cached[2]
+
+    stalls = requests.get(f"{FOOD_STALL_API_URL}/GetAllStalls", timeout=FOOD_STALL_API_TIMEOUT_SECONDS)
+    stalls.raise_for_status()
+    stall = next((s for s in stalls.json()["FoodStalls"] if str(s.get("stall_id")) == stall_id), None)
+    if stall is None:
+        return None
+    menu = requests.get(f"{FOOD_STALL_API_URL}/GetAllFoodFromStall/{stall_id}", timeout=FOOD_STALL_API_TIMEOUT_SECONDS)
+    menu.raise_for_status()
+    price_index = build_price_index([
+        {"id": str(item["menu_item_id"]), "food_name": item["food_name"], "food_price": item["food_price"]}
+        for item in menu.json()["StallItems"]
+    ])
+    delivery_fee = stall.get("delivery_fee") or 0
+    with food_stall_prices_lock:
+        food_stall_prices[stall_id] = (time.monotonic() + FOOD_STALL_API_CACHE_SECONDS, price_index, delivery_fee)
+    return price_index, delivery_fee
+
+
+# POST an order's items to price them against the stall's current menu.
+# Body: {"order_items": [{"order_item": name or "food_id": id, "order_quantity": n}, ...]}
+# Returns the priced items with the subtotal, delivery fee and total in integer cents, and
+# "price_source" ("catalog" or "food_stall_api") naming the menu that was used.
+@app.route("/stalls/<stall_id>/quote", methods=["POST"])
+def quote_stall_order(stall_id):
+    data = request.get_json()
+    if not data or not isinstance(data.get("order_items"), list):
+        abort(400, description="'order_items' must be a list")
+
+    snapshot, stall_data = get_catalog_stall(stall_id)
+    if stall_data is not None:
+        price_source = "catalog"
+        price_index = snapshot.prices.get(stall_id)
+        if price_index is None:
+            price_index = build_price_index(stall_data.get("menu", []))
+        delivery_fee = stall_data.get("delivery_fee", 0)
+    else:
+        price_source = "food_stall_api"
+        try:
+            food_stall = load_food_stall_prices(stall_id)
+        except (requests.RequestException, KeyError, TypeError, ValueError) as e:
+            print(f"Could not load FoodStallAPI menu for stall {stall_id}: {str(e)}")
+            return jsonify({"error": "Could not load the stall menu, please try again"}), 502
+        if food_stall is None:
+            abort(404, description="Food stall not found")
+        price_index, delivery_fee = food_stall
+
+    try:
+        quote = quote_order(data["order_items"], price_index, delivery_fee)
+    except PricingError as e:
+        return jsonify({"error": str(e), "unknown_items": e.unknown_items}), 400
+
+    quote["stall_id"] = stall_id
+    quote["price_source"] = price_source
+    return catalog_response(snapshot, quote)
 
 
 # POST to create a new food stall.
@@ -92,12 +515,46 @@ def create_stall():
         if menu_items:
             return add_menu_items(doc_ref.id, menu_items)
 
+        refresh_catalog(doc_ref.id)
         return jsonify(new_stall), 201
 
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
 
 
+# Firestore allows at most 500 writes in a single batch commit
+MAX_BATCH_WRITES = 500
+
+
+# Match an incoming menu against the stored one: items are paired by id, then by food_name,
+# and unchanged pairs produce no write. Returns (inserts, [(food_id, item)], [food_id]).
+def diff_menu(existing_items, incoming_items):
+    by_id = {item["id"]: item for item in existing_items}
+    by_name = {}
+    for item in existing_items:
+        by_name.setdefault(item.get("food_name"), item)
+
+    inserts, updates, matched = [], [], set()
+    for raw_item in incoming_items:
+        raw_item = dict(raw_item)
+        food_id = raw_item.pop("id", None)
+        menu_item = MenuItemModel(**raw_item).to_dict()
+
+        current = by_id.get(food_id)
+        if current is None or current["id"] in matched:
+            current = by_name.get(menu_item["food_name"])
+        if current is None or current["id"] in matched:
+            inserts.append(menu_item)
+            continue
+
+        matched.add(current["id"])
+        if {k: v for k, v in current.items() if k != "id"} != menu_item:
+            updates.append((current["id"], menu_item))
+
+    deletes = [item["id"] for item in existing_items if item["id"] not in matched]
+    return inserts, updates, deletes
+
+
 # PUT to update an existing food stall.
 @app.route("/stalls/<stall_id>", methods=["PUT"])
 def update_stall(stall_id):
@@ -122,34 +579,27 @@ def update_stall(stall_id):
         # Validate the updated data
         stall_model = StallModel.from_dict(current_data)
 
-        # Update the document with validated data
-        doc_ref.update(stall_model.to_dict())
-
-        # Re-read the updated document
-        updated_doc = doc_ref.get()
-        stall_data = updated_doc.to_dict()
-        stall_data["id"] = updated_doc.id
-
-        # Also fetch updated menu items.
-        menu_docs = doc_ref.collection("menu").stream()
-        menu_list = []
-        for menu_doc in menu_docs:
-            item = menu_doc.to_dict()
-            item["id"] = menu_doc.id
-            menu_list.append(item)
-        stall_data["menu"] = menu_list
-
-        # If menu items were provided, update them
-        if menu_items is not None:
-            # Delete existing menu items
-            for menu_doc in doc_ref.collection("menu").stream():
-                menu_doc.reference.delete()
-
-            # Add new menu items
-            if menu_items:
-                add_menu_items(stall_id, menu_items)
-                stall_data["menu"] = menu_items
+        batch = db.batch()
+        batch.update(doc_ref, stall_model.to_dict())
 
+        # If menu items were provided, write only the changes against the current menu
+        if menu_items is not None:
+            existing_items = get_menu_items(doc_ref)
+            inserts, updates, deletes = diff_menu(existing_items, menu_items)
+            if 1 + len(inserts) + len(updates) + len(deletes) > MAX_BATCH_WRITES:
+                return jsonify({
+                    "error": f"At most {MAX_BATCH_WRITES - 1} menu items can change in a single update"
+                }), 400
+            for menu_item in inserts:
+                batch.set(doc_ref.collection("menu").document(), menu_item)
+            for food_id, menu_item in updates:
+                batch.set(doc_ref.collection("menu").document(food_id), menu_item)
+            for food_id in deletes:
+                batch.delete(doc_ref.collection("menu").document(food_id))
+
+        batch.commit()
+
+        stall_data = refresh_catalog(stall_id)
         return jsonify(stall_data), 200
 
     except ValidationError as e:
@@ -169,22 +619,17 @@ def delete_stall(stall_id):
         menu_doc.reference.delete()
     # Delete the stall document.
     doc_ref.delete()
+    refresh_catalog(stall_id)
     return jsonify({"message": f"Food stall {stall_id} deleted"}), 200
 
 
 # GET all food items for a specific stall (its menu).
 @app.route("/stalls/<stall_id>/menu", methods=["GET"])
 def get_menu(stall_id):
-    doc_ref = db.collection("stalls").document(stall_id)
-    if not doc_ref.get().exists:
+    snapshot, stall_data = get_catalog_stall(stall_id)
+    if stall_data is None:
         abort(404, description="Food stall not found")
-    menu_docs = doc_ref.collection("menu").stream()
-    menu_items = []
-    for menu_doc in menu_docs:
-        item = menu_doc.to_dict()
-        item["id"] = menu_doc.id
-        menu_items.append(item)
-    return jsonify(menu_items), 200
+    return catalog_response(snapshot, stall_data["menu"])
 
 
 # Helper function to add menu items
@@ -209,8 +654,12 @@ def add_menu_items(stall_id, items):
             new_items.append(item_dict)
 
         except ValidationError as e:
+            # Items before the invalid one were already written
+            refresh_catalog(stall_id)
             return jsonify({"error": f"Invalid menu item: {str(e)}"}), 400
 
+    refresh_catalog(stall_id)
+
     # Get updated stall data
     stall_doc = doc_ref.get()
     stall_data = stall_doc.to_dict()
@@ -253,6 +702,7 @@ def update_menu_item(stall_id, food_id):
 
         # Update the document with validated data
         menu_doc_ref.update(menu_item.to_dict())
+        refresh_catalog(stall_id)
 
         # Return updated menu item with ID
         updated_data = menu_item.to_dict()
@@ -271,12 +721,152 @@ def delete_menu_item(stall_id, food_id):
     if not menu_doc_ref.get().exists:
         abort(404, description="Menu item not found for this stall")
     menu_doc_ref.delete()
+    refresh_catalog(stall_id)
     return (
         jsonify({"message": f"Menu item {food_id} deleted from stall {stall_id}"}),
         200,
     )
 
 
+# Streaming NDJSON catalog import: one stall per line, with its menu under "menu".
+# Rows are validated and written through a BulkWriter (stall, menu items and the catalog
+# document), flushing every IMPORT_FLUSH_ROWS rows so memory stays flat for any file size.
+# A row counts as imported only once every one of its writes is confirmed. A row with an
+# invalid stall or menu item is skipped as a whole, and a row with a failed write is
+# reported as failed and its other documents are deleted again.
+IMPORT_FLUSH_ROWS = int(os.getenv("STALL_IMPORT_FLUSH_ROWS", "500"))
+IMPORT_MAX_OPS_PER_SECOND = int(os.getenv("STALL_IMPORT_MAX_OPS_PER_SECOND", "500"))
+IMPORT_MAX_WRITE_ATTEMPTS = 3
+MAX_IMPORT_ERRORS = 100
+
+
+def import_stalls(lines, progress=None):
+    """Import NDJSON stall rows and return a summary; progress(summary) is called after each flush"""
+    summary = {"rows": 0, "stalls": 0, "menu_items": 0, "failed_rows": 0, "failed_writes": 0, "errors": []}
+    lock = threading.Lock()
+    # Rows written since the last flush: line number -> {"refs", "remaining", "menu_items", "failed"}
+    rows = {}
+    row_of_path = {}  # document path -> line number, for rows in flight
+
+    def record_error(error):
+        with lock:
+            if len(summary["errors"]) < MAX_IMPORT_ERRORS:
+                summary["errors"].append(error)
+
+    def finish_write(path, error=None):
+        with lock:
+            line_number = row_of_path.pop(path, None)
+            if line_number is None:
+                return  # a cleanup delete
+            row = rows[line_number]
+            row["remaining"] -= 1
+            if error is not None:
+                summary["failed_writes"] += 1
+                if not row["failed"]:
+                    row["failed"] = True
+                    summary["failed_rows"] += 1
+            if row["remaining"] == 0 and not row["failed"]:
+                summary["stalls"] += 1
+                summary["menu_items"] += row["menu_items"]
+        if error is not None:
+            record_error({"line": line_number, "document": path, "error": error})
+
+    def on_write_result(reference, _result, _bulk_writer):
+        finish_write(reference.path)
+
+    def on_write_error(failure, _bulk_writer):
+        if failure.attempts < IMPORT_MAX_WRITE_ATTEMPTS:
+            return True
+        finish_write(failure.operation.reference.path, failure.message)
+        return False
+
+    bulk_writer = db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=min(500, IMPORT_MAX_OPS_PER_SECOND),
+        max_ops_per_second=IMPORT_MAX_OPS_PER_SECOND,
+        mode=SendMode.parallel,
+    ))
+    bulk_writer.on_write_result(on_write_result)
+    bulk_writer.on_write_error(on_write_error)
+
+    def flush():
+        bulk_writer.flush()
+        # Remove what was written for rows that did not make it in completely
+        failed = [row for row in rows.values() if row["failed"]]
+        rows.clear()
+        for row in failed:
+            for ref in row["refs"]:
+                bulk_writer.delete(ref)
+        if failed:
+            bulk_writer.flush()
+
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            summary["rows"] += 1
+
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("row must be a JSON object")
+                menu_items = [MenuItemModel(**item).to_dict() for item in row.pop("menu", None) or []]
+                stall_model = StallModel(**row)
+            except (ValueError, TypeError, ValidationError) as e:
+                summary["failed_rows"] += 1
+                record_error({"line": line_number, "error": str(e)})
+                continue
+
+            stall_ref = db.collection("stalls").document()
+            stall_dict = stall_model.to_dict()
+            catalog_ref = db.collection(CATALOG_COLLECTION).document(stall_ref.id)
+            menu_refs = [stall_ref.collection("menu").document() for _ in menu_items]
+            refs = [stall_ref, *menu_refs, catalog_ref]
+            with lock:
+                rows[line_number] = {
+                    "refs": refs, "remaining": len(refs), "menu_items": len(menu_items), "failed": False
+                }
+                for ref in refs:
+                    row_of_path[ref.path] = line_number
+
+            bulk_writer.create(stall_ref, stall_dict)
+            menu = []
+            for menu_ref, menu_item in zip(menu_refs, menu_items):
+                bulk_writer.create(menu_ref, menu_item)
+                menu.append({**menu_item, "id": menu_ref.id})
+            bulk_writer.set(catalog_ref, {
+                **stall_dict,
+                "menu": menu,
+                "version": 1,
+                "updated_at": datetime.now().isoformat(),
+            })
+
+            if summary["rows"] % IMPORT_FLUSH_ROWS == 0:
+                flush()
+                if progress:
+                    progress(summary)
+        flush()
+    finally:
+        bulk_writer.close()
+
+    if progress:
+        progress(summary)
+    return summary
+
+
+# POST an NDJSON body (one stall with its menu per line) to bulk import stalls.
+@app.route("/stalls:import", methods=["POST"])
+def import_stalls_endpoint():
+    summary = import_stalls(
+        request.stream,
+        progress=lambda s: print(f"Stall import: {s['rows']} rows, {s['stalls']} stalls, {s['failed_rows']} failed"),
+    )
+    if summary["stalls"]:
+        warm_catalog()
+    return jsonify(summary), 200
+
+
 # Test function to add bulk data
 @app.route("/test/add-bulk-data", methods=["POST"])
 def add_bulk_test_data():
@@ -567,6 +1157,8 @@ def add_bulk_test_data():
                         f"Error adding menu item {item.get('food_name')} to stall {stall_data.get('stall_name')}: {str(e)}"
                     )
 
+            refresh_catalog(stall_id)
+
             # Record success
             stall_result = stall_model.to_dict()
             stall_result["id"] = stall_id
@@ -582,4 +1174,34 @@ def add_bulk_test_data():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-catalog":
+        # Usage: python atomic/stall.py rebuild-catalog [--workers N]
+        parser = argparse.ArgumentParser(description="Rebuild every stall_catalog document")
+        parser.add_argument("command")
+        parser.add_argument("--workers", type=int, default=16)
+        args = parser.parse_args()
+        print(f"Rebuilt catalog documents for {rebuild_catalog_docs(args.workers)} stalls")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "import-catalog":
+        # Usage: python atomic/stall.py import-catalog stalls.ndjson (use - for stdin)
+        parser = argparse.ArgumentParser(description="Import NDJSON stalls with their menus")
+        parser.add_argument("command")
+        parser.add_argument("file")
+        args = parser.parse_args()
+        source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        with source:
+            summary = import_stalls(
+                source,
+                progress=lambda s: print(f"{s['rows']} rows, {s['stalls']} stalls, {s['failed_rows']} failed", file=sys.stderr),
+            )
+        print(json.dumps(summary, indent=2))
+        # Running stall services pick the new stalls up from their catalog listener
+        sys.exit(1 if summary["failed_rows"] or summary["failed_writes"] else 0)
+
+    # Warm the catalog before serving; if Firestore is unreachable the first read retries
+    try:
+        warm_catalog()
+    except Exception as e:
+        print(f"Could not warm stall catalog: {str(e)}")
     app.run(debug=True, host="0.0.0.0", port=5002, threaded=True)
@@ -34,6 +34,7 @@ EXCHANGE_NAME = "order_delivery_exchange"
 EXCHANGE_TYPE = "fanout"
 ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", "http://localhost:5003")
 PICKER_SERVICE_URL = os.getenv("PICKER_SERVICE_URL", "http://localhost:5001")
+STALL_SERVICE_URL = os.getenv("STALL_SERVICE_URL", "http://localhost:5002")
 CALC_PAYMENT_SERVICE_URL = os.getenv("CALC_PAYMENT_SERVICE_URL", "http://calc-payment-service:5009")
 
 # Track active pickers and their socket IDs
@@ -70,6 +71,34 @@ def get_order_details(order_id):
         print(f"Error getting order details: {e}")
         return None
 
+# Helper function to get the details of many orders with a single request
+def get_orders_details(order_ids):
+    try:
+        response = requests.post(f"{ORDER_SERVICE_URL}/orders:batchGet", json={"order_ids": list(order_ids)})
+        if response.status_code == 200:
+            return {order["id"]: order for order in response.json()["orders"]}
+        return None
+    except Exception as e:
+        print(f"Error getting order details: {e}")
+        return None
+
+# Helper function to credit the picker of a completed order with its delivery fee.
+# The picker service records it as a pending earning keyed by order, so repeats are no-ops.
+def record_picker_earning(order):
+    picker_id = order.get("picker_id") if order else None
+    amount_cents = order.get("delivery_fee_cents") if order else None
+    if not picker_id or not amount_cents:
+        return
+    try:
+        response = requests.post(
+            f"{PICKER_URL}/{picker_id}/earnings",
+            json={"order_id": order.get("id"), "amount_cents": amount_cents}
+        )
+        if response.status_code not in (200, 201):
+            print(f"Failed to record picker earning: {response.text}")
+    except Exception as e:
+        print(f"Error recording picker earning: {e}")
+
 # =========================================================================
 # Subscribe to RabbitMQ Exchange
 # =========================================================================
@@ -287,6 +316,27 @@ def create_order():
         if not order_data:
             return jsonify({"error": "Missing order data"}), 400
         
+        # Price the order against the stall's menu; client-supplied prices are replaced
+        quote_response = requests.post(
+            f"{STALL_SERVICE_URL}/stalls/{order_data.get('stall_id')}/quote",
+            json={"order_items": order_data.get("order_items", [])}
+        )
+        if quote_response.status_code != 200:
+            print(f"Failed to price order: {quote_response.text}")
+            return jsonify({
+                "error": "Failed to price order",
+                "details": quote_response.text
+            }), quote_response.status_code
+        quote = quote_response.json()
+        order_data["order_items"] = [
+            {k: v for k, v in line.items() if k != "line_cents"} for line in quote["order_items"]
+        ]
+        order_data["subtotal_cents"] = quote["subtotal_cents"]
+        order_data["delivery_fee_cents"] = quote["delivery_fee_cents"]
+        order_data["total_cents"] = quote["total_cents"]
+        total_amount = quote["total_cents"] / 100
+        print(f"Quoted order total: {total_amount}")
+        
         # Calls the ORDER MS to create a new order
         print(f"Sending to order service: {ORDER_URL}")
         response = requests.post(ORDER_URL, json=order_data)
@@ -302,26 +352,9 @@ def create_order():
         
         # Process payment for the order
         try:
-            # Calculate total amount from order items
-            order_items = order_data.get("order_items", [])
-            total_amount = 0
-            
-            for item in order_items:
-                # Make sure item_price and quantity can be properly converted to numbers
-                try:
-                    item_price = float(item.get("order_price"))
-                    item_quantity = int(item.get("order_quantity"))
-                    item_total = item_price * item_quantity
-                    print(f"Item: {item.get('order_item', 'unknown')} - Price: {item_price} x Quantity: {item_quantity} = {item_total}")
-                    total_amount += item_total
-                except (ValueError, TypeError) as e:
-                    print(f"Error parsing item values: {e}, using defaults")
-            
-            print(f"Calculated total amount for order {order_id}: {total_amount}")
-            
             # Make sure the total amount is greater than zero
             if total_amount <= 0:
-                print(f"Warning: Order total is {total_amount}, setting minimum amount of 0.01")
+                print(f"Warning: Order total is {total_amount}")
             
             # Prepare payment data
             payment_data = {
@@ -484,12 +517,17 @@ def update_order_status():
         
         updated_order = status_response.json()
         
+        order_details = None
+        if new_status == "completed":
+            order_details = get_order_details(order_id)
+            record_picker_earning(order_details)
+        
         # Notify the customer about the status update
         if order_id in order_customers:
             customer_id = order_customers[order_id]
             
             # Get the full order details
-            order_details = get_order_details(order_id)
+            order_details = order_details or get_order_details(order_id)
             
             # Emit the picker update event
             socketio.emit(WS_PICKER_UPDATE, {
@@ -609,6 +647,17 @@ def handle_register_picker(data):
     active_pickers[picker_id] = request.sid
     connected_pickers[picker_id] = request.sid
     
+    # Refresh the pending queue in one call so the picker never sees stale or taken orders
+    if pending_orders:
+        latest_orders = get_orders_details(pending_orders.keys())
+        if latest_orders is not None:
+            for order_id in list(pending_orders.keys()):
+                latest = latest_orders.get(order_id)
+                if latest is None or latest.get("order_status") != "pending":
+                    pending_orders.pop(order_id)
+                else:
+                    pending_orders[order_id] = latest
+    
     # Send all currently pending orders to this newly connected picker
     print(f"Sending {len(pending_orders)} pending orders to picker {picker_id}")
     
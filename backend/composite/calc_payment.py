@@ -4,6 +4,7 @@ import requests
 import os
 from datetime import datetime
 import uuid
+from models.pricing import from_cents, order_total_cents
 
 app = Flask(__name__)
 CORS(app)
@@ -99,9 +100,8 @@ def customer_pay_picker():
     Handle payment from a customer.
     
     This endpoint:
-    1. Checks if the customer has enough credits
-    2. Deducts credits from the customer
-    3. Logs the payment transaction
+    1. Deducts credits from the customer if they have enough (one call)
+    2. Logs the payment transaction
     """
     try:
         data = request.get_json()
@@ -124,41 +124,24 @@ def customer_pay_picker():
         except (ValueError, TypeError):
             return jsonify({"error": "Amount must be a valid number"}), 400
             
-        # Step 1: Check if customer has enough credits
+        # Step 1: Deduct credits from customer if the balance covers the amount
         try:
-            customer_response = requests.get(f"{CUSTOMER_SERVICE_URL}/customers/{customer_id}/credits")
-            
-            if customer_response.status_code != 200:
-                return jsonify({
-                    "error": "Failed to retrieve customer credits",
-                    "details": customer_response.json()
-                }), customer_response.status_code
-            
-            customer_credits = customer_response.json().get("customer_credits", 0)
-            
-            if customer_credits < amount:
-                return jsonify({
-                    "error": "Insufficient credits",
-                    "customer_credits": customer_credits,
-                    "required_amount": amount
-                }), 400
-                
-        except Exception as e:
-            return jsonify({
-                "error": f"Error checking customer credits: {str(e)}"
-            }), 500
-        
-        # Step 2: Deduct credits from customer
-        try:
-            deduct_response = requests.patch(
-                f"{CUSTOMER_SERVICE_URL}/customers/{customer_id}/credits",
-                json={"amount": -amount}  # Negative amount for deduction
+            deduct_response = requests.post(
+                f"{CUSTOMER_SERVICE_URL}/customers/{customer_id}/credits:debit",
+                json={"amount": amount}
             )
             
             if deduct_response.status_code != 200:
+                try:
+                    details = deduct_response.json()
+                except ValueError:
+                    details = deduct_response.text
+                if (deduct_response.status_code == 409 and isinstance(details, dict)
+                        and details.get("code") == "insufficient_credits"):
+                    return jsonify(details), 400
                 return jsonify({
                     "error": "Failed to deduct credits from customer",
-                    "details": deduct_response.json()
+                    "details": details
                 }), deduct_response.status_code
                 
             # Get updated customer credits info
@@ -169,7 +152,7 @@ def customer_pay_picker():
                 "error": f"Error deducting customer credits: {str(e)}"
             }), 500
         
-        # Step 3: Log the payment transaction
+        # Step 2: Log the payment transaction
         try:
             payment_data = {
                 "log_id": f"payment_{customer_id}",
@@ -241,7 +224,10 @@ def customer_refund():
         
         # Step 1: Get the order details to calculate refund amount
         try:
-            order_response = requests.get(f"http://order-service:5003/orders/{order_id}")
+            order_response = requests.get(
+                f"http://order-service:5003/orders/{order_id}",
+                params={"include_archived": "true"}  # Completed orders may already be archived
+            )
             
             if order_response.status_code != 200:
                 return jsonify({
@@ -257,9 +243,8 @@ def customer_refund():
                     "error": "Order does not belong to this customer"
                 }), 403
                 
-            # Calculate total refund amount from order items
-            order_items = order_data.get("order_items", [])
-            refund_amount = sum(item["order_price"] * item["order_quantity"] for item in order_items)
+            # Refund what was charged: the order's quoted total including delivery
+            refund_amount = from_cents(order_total_cents(order_data))
             
             # Verify it's valid to refund (completed order)
             if order_data.get("order_status") != "completed":
@@ -11,6 +11,24 @@ class OrderStatus(str, Enum):
     completed = "completed"
     cancelled = "cancelled"
 
+# Legal order status changes. Completed and cancelled orders are final,
+# and an assigned order can go back to pending when its picker drops it.
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.pending: {OrderStatus.assigned, OrderStatus.cancelled},
+    OrderStatus.assigned: {OrderStatus.preparing, OrderStatus.pending, OrderStatus.cancelled},
+    OrderStatus.preparing: {OrderStatus.delivering, OrderStatus.cancelled},
+    OrderStatus.delivering: {OrderStatus.completed, OrderStatus.cancelled},
+    OrderStatus.completed: set(),
+    OrderStatus.cancelled: set(),
+}
+
+def can_transition(current_status, new_status):
+    """Check whether an order may move from current_status to new_status"""
+    try:
+        return OrderStatus(new_status) in ORDER_STATUS_TRANSITIONS[OrderStatus(current_status)]
+    except ValueError:
+        return False
+
 class OrderItemModel(BaseModel):
     order_item: str = Field(..., min_length=1)
     order_quantity: int = Field(..., gt=0)
@@ -35,6 +53,10 @@ class OrderModel(BaseModel):
     order_completed: Optional[datetime] = None
     is_paid: bool = Field(default=False)
     order_items: List[OrderItemModel] = Field(..., min_items=1)
+    # Server-side quote taken when the order was placed, in integer cents
+    subtotal_cents: Optional[int] = Field(default=None, ge=0)
+    delivery_fee_cents: Optional[int] = Field(default=None, ge=0)
+    total_cents: Optional[int] = Field(default=None, ge=0)
     
     def to_dict(self):
         """Convert model to dictionary for Firestore storage"""
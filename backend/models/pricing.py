@@ -0,0 +1,98 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+from pydantic import BaseModel, Field, ValidationError
+
+
+class PricingError(ValueError):
+    """Raised when order items cannot be priced against a stall's menu"""
+
+    def __init__(self, message, unknown_items=None):
+        super().__init__(message)
+        self.unknown_items = unknown_items or []
+
+
+class QuoteItemModel(BaseModel):
+    """An order item to price; identified by food_id or by its name in order_item"""
+    order_item: Optional[str] = Field(default=None, min_length=1)
+    food_id: Optional[str] = Field(default=None, min_length=1)
+    order_quantity: int = Field(..., gt=0)
+
+
+def to_cents(amount):
+    """Convert a price in dollars (float, int or str) to integer cents"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Convert integer cents back to a dollar amount"""
+    return cents / 100
+
+
+def menu_key(name):
+    return name.strip().lower() if isinstance(name, str) else None
+
+
+def build_price_index(menu):
+    """Map menu item ids and lowercased food names to (food_name, price in cents)"""
+    index = {}
+    for menu_item in menu:
+        entry = (menu_item["food_name"], to_cents(menu_item["food_price"]))
+        if menu_item.get("id"):
+            index[menu_item["id"]] = entry
+        index.setdefault(menu_key(menu_item["food_name"]), entry)
+    return index
+
+
+def quote_order(order_items, price_index, delivery_fee=0):
+    """Price order items against a stall's price index.
+
+    Items are resolved by "food_id" when given, otherwise by "order_item" (the food name).
+    Returns the priced lines and the subtotal, delivery fee and total in cents."""
+    lines = []
+    unknown = []
+    for position, raw_item in enumerate(order_items):
+        if not isinstance(raw_item, dict):
+            raise PricingError(f"Order item {position} must be an object")
+        try:
+            item = QuoteItemModel(**raw_item)
+        except ValidationError as e:
+            raise PricingError(f"Invalid order item {position}: {e}")
+        if item.food_id is None and item.order_item is None:
+            raise PricingError(f"Order item {position} needs 'order_item' or 'food_id'")
+
+        entry = price_index.get(item.food_id) or price_index.get(menu_key(item.order_item))
+        if entry is None:
+            unknown.append(item.food_id or item.order_item)
+            continue
+        quantity = item.order_quantity
+        food_name, price_cents = entry
+        lines.append({
+            "order_item": food_name,
+            "order_quantity": quantity,
+            "order_price": from_cents(price_cents),
+            "line_cents": price_cents * quantity,
+        })
+    if unknown:
+        raise PricingError("Some order items are not on the menu", unknown)
+    if not lines:
+        raise PricingError("Order has no items")
+
+    subtotal_cents = sum(line["line_cents"] for line in lines)
+    delivery_fee_cents = to_cents(delivery_fee or 0)
+    return {
+        "order_items": lines,
+        "subtotal_cents": subtotal_cents,
+        "delivery_fee_cents": delivery_fee_cents,
+        "total_cents": subtotal_cents + delivery_fee_cents,
+    }
+
+
+def order_total_cents(order):
+    """Total charged for a stored order: the quoted total, or the sum of its item prices
+    for orders placed before server-side pricing"""
+    if order.get("total_cents") is not None:
+        return int(order["total_cents"])
+    return sum(
+        to_cents(item["order_price"]) * int(item["order_quantity"])
+        for item in order.get("order_items", [])
+    )
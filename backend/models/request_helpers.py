@@ -0,0 +1,90 @@
+import base64
+import json
+import re
+from flask import request, abort
+
+
+# Helpers for the optional ?fields=a,b,c sparse projection on read endpoints.
+# Dotted paths such as location.address select nested values.
+FIELD_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def parse_fields(whole_fields=()):
+    """Read ?fields= from the request. Fields listed in whole_fields (item lists such as
+    "order_items" or "menu") can only be requested as a whole, not by sub-path.
+    Returns None when no projection was requested."""
+    fields = request.args.get("fields")
+    if not fields:
+        return None
+    fields = [f.strip() for f in fields.split(",") if f.strip()]
+    if not fields or any(not FIELD_NAME_PATTERN.match(f) for f in fields):
+        abort(400, description="'fields' must be a comma separated list of field names")
+    for whole_field in whole_fields:
+        if any(f.startswith(whole_field + ".") for f in fields):
+            abort(400, description=f"'{whole_field}' can only be requested as a whole")
+    return fields
+
+
+def project(record, fields):
+    """Keep only the requested fields; dotted paths such as a.b select nested values"""
+    projected = {}
+    for field in fields:
+        parts = field.split(".")
+        # A parent that is requested as a whole already contains this path
+        if any(".".join(parts[:n]) in fields for n in range(1, len(parts))):
+            continue
+        value = record
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
+
+
+# Helpers for the opaque "page_token" cursor of list endpoints. The token holds the
+# ordering field and id of the last document on the page, which is exactly what
+# Firestore needs for start_after() when ordering by that field and then __name__.
+def encode_page_token(doc, order_field):
+    cursor = {order_field: doc.get(order_field), "id": doc.id}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_page_token(token, order_field):
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        return {order_field: cursor[order_field], "__name__": cursor["id"]}
+    except (ValueError, KeyError, TypeError):
+        abort(400, description="Invalid page_token")
+
+
+def parse_batch_ids(data, key, max_ids, noun):
+    """Validate a batchGet body of the form {key: [...]} and return its ids in request
+    order without duplicates"""
+    if not isinstance(data, dict) or not isinstance(data.get(key), list):
+        abort(400, description=f"Request must include a '{key}' list")
+    # Keep the request order but skip duplicates
+    ids = list(dict.fromkeys(data[key]))
+    if not all(isinstance(doc_id, str) and doc_id for doc_id in ids):
+        abort(400, description=f"'{key}' must be a list of non-empty strings")
+    if len(ids) > max_ids:
+        abort(400, description=f"At most {max_ids} {noun} can be fetched at once")
+    return ids
+
+
+def batch_get_documents(db, collection, ids, fields=None):
+    """Fetch documents by id with one get_all() call.
+    Returns (records in request order, ids that do not exist)."""
+    refs = [db.collection(collection).document(doc_id) for doc_id in ids]
+    found = {}
+    for doc in db.get_all(refs, field_paths=fields or None):
+        if doc.exists:
+            record = doc.to_dict()
+            record["id"] = doc.id
+            found[doc.id] = record
+    return ([found[doc_id] for doc_id in ids if doc_id in found],
+            [doc_id for doc_id in ids if doc_id not in found])
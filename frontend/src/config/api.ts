@@ -28,3 +28,9 @@ export const CANCELLATION_URL = `http://localhost:5000`;
 // export const CREDIT_URL = `${API_BASE_URL}/api/credit`;
 // export const LOCATION_URL = `${API_BASE_URL}/api/location`;
 // export const CANCELLATION_URL = `${API_BASE_URL}/api/cancellation`;
+
+// Page size used when listing orders (order endpoints return newest first)
+export const ORDERS_PAGE_SIZE = 50;
+
+// Page size used when listing payments (payment endpoints return newest first)
+export const PAYMENTS_PAGE_SIZE = 50;
@@ -1,9 +1,10 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { ArrowLeft, Trash2, MapPin } from "lucide-react";
 import axios from "axios";
 import { toast } from "sonner";
 import * as API from "@/config/api";
+import { fetchOrderQuote, OrderQuote } from "@/services/api";
 
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -26,12 +27,40 @@ export default function CartPage() {
   // Get user from auth state
   const { user, isAuthenticated } = useAppSelector((state) => state.auth);
 
-  const subtotal = cart.reduce(
-    (sum, item) => sum + item.price * item.quantity,
-    0
-  );
-  const deliveryFee = subtotal > 0 ? 3.99 : 0;
-  const total = subtotal + deliveryFee;
+  // The server prices the order from the stall's menu, including its delivery fee;
+  // show that quote so the total shown is the amount that will be charged. Until it
+  // loads (or if it fails) the cart shows an estimate and checkout prices the order anyway.
+  const [quote, setQuote] = useState<OrderQuote | null>(null);
+  const [quoteError, setQuoteError] = useState(false);
+
+  useEffect(() => {
+    const stallId = cart[0]?.restaurantId;
+    setQuote(null);
+    setQuoteError(false);
+    if (!stallId) return;
+
+    let cancelled = false;
+    fetchOrderQuote(
+      stallId,
+      cart.map((item) => ({ order_item: item.name, order_quantity: item.quantity }))
+    )
+      .then((result) => {
+        if (!cancelled) setQuote(result);
+      })
+      .catch((error) => {
+        console.error("Error pricing cart:", error);
+        if (!cancelled) setQuoteError(true);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [cart]);
+
+  const subtotal = quote
+    ? quote.subtotal_cents / 100
+    : cart.reduce((sum, item) => sum + item.price * item.quantity, 0);
+  const deliveryFee = quote ? quote.delivery_fee_cents / 100 : 0;
+  const total = quote ? quote.total_cents / 100 : subtotal;
 
   const handleLocationChange = (location: string) => {
     setDeliveryAddress(location);
@@ -99,8 +128,10 @@ export default function CartPage() {
       navigate("/orders");
     } catch (error) {
       console.error("Checkout error:", error);
+      // Pricing failures (e.g. items no longer on the menu) come back as an error message
+      const message = axios.isAxiosError(error) ? error.response?.data?.error : undefined;
       toast.error("Failed to place order", {
-        description: "Please try again later.",
+        description: message || "Please try again later.",
       });
     } finally {
       setIsLoading(false);
@@ -173,13 +204,19 @@ export default function CartPage() {
                 </div>
                 <div className="flex justify-between">
                   <span className="text-muted-foreground">Delivery Fee</span>
-                  <span>${deliveryFee.toFixed(2)}</span>
+                  <span>{quote ? `$${deliveryFee.toFixed(2)}` : "—"}</span>
                 </div>
                 <Separator />
                 <div className="flex justify-between font-semibold">
-                  <span>Total</span>
+                  <span>{quote ? "Total" : "Estimated Total"}</span>
                   <span>${total.toFixed(2)}</span>
                 </div>
+                {quoteError && (
+                  <p className="text-sm text-muted-foreground">
+                    We couldn't confirm prices right now. Your total will be
+                    calculated when you check out.
+                  </p>
+                )}
               </div>
 
               {/* Replace Delivery Address Input with Button + Dialog */}
@@ -13,6 +13,7 @@ import { format } from "date-fns";
 import { useAppSelector } from "@/redux/hooks";
 import { toast } from "sonner";
 import * as API from "@/config/api";
+import { fetchCustomerOrders } from "@/services/api";
 
 import { Button } from "@/components/ui/button";
 import {
@@ -37,6 +38,8 @@ import {
 export default function CompletedOrdersPage() {
   const [completedOrders, setCompletedOrders] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextPageToken, setNextPageToken] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isSubmitting, setIsSubmitting] = useState(false);
   const { user, isAuthenticated } = useAppSelector((state) => state.auth);
   const navigate = useNavigate();
@@ -52,21 +55,14 @@ export default function CompletedOrdersPage() {
 
     try {
       setLoading(true);
-      const response = await axios.get(
-        `${API.ORDER_URL}/customers/${user.id}/orders`
-      );
-
-      // Filter for completed orders only and sort by date (newest first)
-      const completedOrders = response.data
-        .filter((order: any) => order.order_status === "completed")
-        .sort((a: any, b: any) => {
-          return (
-            new Date(b.order_completed || b.order_start).getTime() -
-            new Date(a.order_completed || a.order_start).getTime()
-          );
-        });
-
-      setCompletedOrders(completedOrders);
+      // The first page of completed orders (newest first, archived ones included);
+      // more are loaded on demand
+      const page = await fetchCustomerOrders(user.id, {
+        status: "completed",
+        include_archived: true,
+      });
+      setCompletedOrders(page.orders);
+      setNextPageToken(page.nextPageToken);
     } catch (error) {
       console.error("Error fetching completed orders:", error);
       toast.error("Failed to load completed orders", {
@@ -77,6 +73,27 @@ export default function CompletedOrdersPage() {
     }
   };
 
+  // Append the next page of completed orders
+  const loadMoreOrders = async () => {
+    if (!user?.id || !nextPageToken) return;
+
+    try {
+      setLoadingMore(true);
+      const page = await fetchCustomerOrders(user.id, {
+        status: "completed",
+        include_archived: true,
+        page_token: nextPageToken,
+      });
+      setCompletedOrders((prev) => [...prev, ...page.orders]);
+      setNextPageToken(page.nextPageToken);
+    } catch (error) {
+      console.error("Error fetching more completed orders:", error);
+      toast.error("Failed to load more orders");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     // Redirect to login if not authenticated
     if (!isAuthenticated) {
@@ -309,6 +326,16 @@ export default function CompletedOrdersPage() {
               </CardFooter>
             </Card>
           ))}
+          {nextPageToken && (
+            <Button
+              variant="outline"
+              className="w-full"
+              onClick={loadMoreOrders}
+              disabled={loadingMore}
+            >
+              {loadingMore ? "Loading..." : "Load more orders"}
+            </Button>
+          )}
         </div>
       )}
 
@@ -10,11 +10,10 @@ import {
   Edit,
   CheckCircle,
 } from "lucide-react";
-import axios from "axios";
+import { fetchCustomerOrders, fetchOrderCount } from "@/services/api";
 import { format } from "date-fns";
 import { useAppSelector } from "@/redux/hooks";
 import { toast } from "sonner";
-import * as API from "@/config/api";
 
 import { Button } from "@/components/ui/button";
 import {
@@ -40,6 +39,9 @@ const orderStatusMap = {
   cancelled: { label: "Cancelled", color: "bg-red-500" },
 };
 
+// Statuses listed on this page; completed orders have their own page
+const ACTIVE_STATUSES = "pending,assigned,preparing,delivering,cancelled";
+
 // UI badge component for order status
 function OrderStatusBadge({ status }: { status: string }) {
   const statusInfo = orderStatusMap[status as keyof typeof orderStatusMap] || {
@@ -58,6 +60,8 @@ export default function OrdersPage() {
   const [orders, setOrders] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [completedOrdersCount, setCompletedOrdersCount] = useState(0); // Track number of completed orders
+  const [nextPageToken, setNextPageToken] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
   const { user, isAuthenticated } = useAppSelector((state) => state.auth);
   const navigate = useNavigate();
   const [selectedOrderForLocation, setSelectedOrderForLocation] = useState<{
@@ -76,27 +80,18 @@ export default function OrdersPage() {
 
     try {
       setLoading(true);
-      const response = await axios.get(
-        `${API.ORDER_URL}/customers/${user.id}/orders`
-      );
-
-      // Filter out completed orders and count them
-      const activeOrders = response.data.filter(
-        (order: any) => order.order_status !== "completed"
-      );
-      const completedOrders = response.data.filter(
-        (order: any) => order.order_status === "completed"
-      );
-      setCompletedOrdersCount(completedOrders.length);
-
-      // Sort orders by date (newest first)
-      const sortedOrders = activeOrders.sort((a: any, b: any) => {
-        return (
-          new Date(b.order_start).getTime() - new Date(a.order_start).getTime()
-        );
-      });
-
-      setOrders(sortedOrders);
+      // The first page of active orders (newest first); the completed orders are
+      // only counted, the server does the counting
+      const [activePage, completedCount] = await Promise.all([
+        fetchCustomerOrders(user.id, { status: ACTIVE_STATUSES }),
+        fetchOrderCount("customers", user.id, {
+          status: "completed",
+          include_archived: true,
+        }),
+      ]);
+      setCompletedOrdersCount(completedCount);
+      setOrders(activePage.orders);
+      setNextPageToken(activePage.nextPageToken);
     } catch (error) {
       console.error("Error fetching orders:", error);
       toast.error("Failed to load orders", {
@@ -107,6 +102,26 @@ export default function OrdersPage() {
     }
   };
 
+  // Append the next page of active orders
+  const loadMoreOrders = async () => {
+    if (!user?.id || !nextPageToken) return;
+
+    try {
+      setLoadingMore(true);
+      const page = await fetchCustomerOrders(user.id, {
+        status: ACTIVE_STATUSES,
+        page_token: nextPageToken,
+      });
+      setOrders((prev) => [...prev, ...page.orders]);
+      setNextPageToken(page.nextPageToken);
+    } catch (error) {
+      console.error("Error fetching more orders:", error);
+      toast.error("Failed to load more orders");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Connect to WebSocket and setup event handlers - run once
   useEffect(() => {
     // Redirect to login if not authenticated
@@ -418,6 +433,16 @@ export default function OrdersPage() {
               </CardFooter>
             </Card>
           ))}
+          {nextPageToken && (
+            <Button
+              variant="outline"
+              className="w-full"
+              onClick={loadMoreOrders}
+              disabled={loadingMore}
+            >
+              {loadingMore ? "Loading..." : "Load more orders"}
+            </Button>
+          )}
         </div>
       )}
 
@@ -43,6 +43,9 @@ export default function ProfilePage() {
   const [isAddCreditsModalOpen, setIsAddCreditsModalOpen] = useState(false)
   const [customerData, setCustomerData] = useState<CustomerData | null>(null)
   const [transactions, setTransactions] = useState<Transaction[]>([])
+  // Cursor for the next (older) page of transactions, undefined on the last page
+  const [transactionsNextToken, setTransactionsNextToken] = useState<string | undefined>()
+  const [isLoadingMoreTransactions, setIsLoadingMoreTransactions] = useState(false)
   const [formData, setFormData] = useState({
     customer_name: "",
     customer_email: "",
@@ -89,11 +92,16 @@ export default function ProfilePage() {
     }
   }
 
-  const fetchTransactions = async () => {
+  // Fetch the newest page of transactions, or the page after pageToken to load more
+  const fetchTransactions = async (pageToken?: string) => {
     if (!user?.id) return;
 
     try {
-      const response = await axios.get(`${API.PAYMENT_URL}/payments/customer/${user.id}`);
+      if (pageToken) setIsLoadingMoreTransactions(true);
+      const response = await axios.get(`${API.PAYMENT_URL}/payments/customer/${user.id}`, {
+        params: { limit: API.PAYMENTS_PAGE_SIZE, page_token: pageToken },
+      });
+      setTransactionsNextToken(response.headers["x-next-page-token"] || undefined);
 
       if (response.data && Array.isArray(response.data)) {
         const payments = response.data;
@@ -109,18 +117,16 @@ export default function ProfilePage() {
           date: txn.timestamp,
         }));
 
-        // Sort by date (most recent first)
-        mappedTransactions.sort(
-          (a, b) => new Date(b.date).getTime() - new Date(a.date).getTime()
-        );
-
-        setTransactions(mappedTransactions);
-      } else {
+        // Pages come newest first, so older pages are appended
+        setTransactions((prev) => (pageToken ? [...prev, ...mappedTransactions] : mappedTransactions));
+      } else if (!pageToken) {
         setTransactions([]);
       }
     } catch (error) {
       console.error("Error fetching transactions:", error);
       toast.error("Failed to load transaction history");
+    } finally {
+      setIsLoadingMoreTransactions(false);
     }
   };
 
@@ -333,6 +339,17 @@ export default function ProfilePage() {
                       </div>
                     </div>
                   ))}
+                  {transactionsNextToken && (
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      className="w-full"
+                      onClick={() => fetchTransactions(transactionsNextToken)}
+                      disabled={isLoadingMoreTransactions}
+                    >
+                      {isLoadingMoreTransactions ? "Loading..." : "Load more transactions"}
+                    </Button>
+                  )}
                 </div>
               ) : (
                 <p className="text-sm text-muted-foreground text-center py-2">
@@ -20,7 +20,13 @@ import { Separator } from "@/components/ui/separator";
 import { useAppSelector } from "@/redux/hooks";
 import { Skeleton } from "@/components/ui/skeleton";
 import websocketService, { WS_EVENTS } from "@/services/websocketService";
-import { fetchPickerOrders } from "@/services/api";
+import {
+  fetchOrderCount,
+  fetchPendingOrders,
+  fetchPickerEarnings,
+  fetchPickerOrders,
+  withStallInfo,
+} from "@/services/api";
 import RouteMap from "@/components/RouteMap";
 
 // Helper function to format currency
@@ -399,6 +405,27 @@ export default function PickerDashboard() {
   const [activeOrder, setActiveOrder] = useState<any>(null);
   const [completedOrders, setCompletedOrders] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
+  // Cursors for the next page of available and past orders (undefined when there is none)
+  const [availableNextToken, setAvailableNextToken] = useState<string | undefined>();
+  const [historyNextToken, setHistoryNextToken] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Totals come from the server instead of being summed over the loaded orders
+  const [totalEarnings, setTotalEarnings] = useState(0);
+  const [completedCount, setCompletedCount] = useState(0);
+
+  // Refresh the recorded earnings and the number of completed deliveries
+  const refreshTotals = async (pickerId: string) => {
+    try {
+      const [earnings, count] = await Promise.all([
+        fetchPickerEarnings(pickerId),
+        fetchOrderCount("pickers", pickerId, { status: "completed", include_archived: true }),
+      ]);
+      setTotalEarnings(earnings.balance);
+      setCompletedCount(count);
+    } catch (error) {
+      console.error("Error fetching picker totals:", error);
+    }
+  };
 
   useEffect(() => {
     if (!user) {
@@ -409,60 +436,23 @@ export default function PickerDashboard() {
     const fetchData = async () => {
       setLoading(true);
       try {
-        // 1. Fetch available orders (orders with status "pending")
-        const pendingResponse = await axios.get(`${API.ORDER_URL}/orders`);
-        const pendingOrders = pendingResponse.data.filter(
-          (order: any) => order.order_status === "pending" && !order.picker_id
-        );
-
-        // Fetch all stall information once instead of for each order
-        let allStalls: any[] = [];
-        try {
-          const stallResponse = await axios.get(
-            `https://personal-dcwqxa6n.outsystemscloud.com/SMUlivery/rest/FoodStallAPI/GetAllStalls`
-          );
-          allStalls = stallResponse.data.FoodStalls || [];
-        } catch (error) {
-          console.error("Error fetching all stalls:", error);
-          toast.error("Failed to load stall information");
-        }
-
-        // Map stall information to each order
-        const ordersWithStallInfo = pendingOrders.map((order: any) => {
-          try {
-            // Find the stall in the cached response that matches our stall_id
-            const stall = allStalls.find((s: any) => Number(s.stall_id) === Number(order.stall_id));
-            if (!stall) {
-              console.warn(`Stall ${order.stall_id} not found for order ${order.id}`);
-              return order;
-            }
-            return {
-              ...order,
-              stall_name: stall.stall_name,
-              stall_location: stall.stall_location,
-            };
-          } catch (error) {
-            console.error(`Error processing stall info for order ${order.id}:`, error);
-            return order;
-          }
-        });
-
-        setAvailableOrders(ordersWithStallInfo);
-
-        // 2. Fetch active and completed orders using fetchPickerOrders
-        const pickerOrders = await fetchPickerOrders(user.id);
-        
-        const activeOrders = pickerOrders.filter((order: any) =>
-          ["assigned", "preparing", "delivering"].includes(order.order_status)
-        );
-
-        setActiveOrder(activeOrders.length > 0 ? activeOrders[0] : null);
-
-        // 3. Filter completed orders
-        const completedOrders = pickerOrders.filter((order: any) =>
-          ["completed", "cancelled"].includes(order.order_status)
-        );
-        setCompletedOrders(completedOrders);
+        // Fetch the first page of each list. The order helpers share one stall
+        // directory request, so the stalls are only fetched once.
+        const [pendingPage, activePage, historyPage] = await Promise.all([
+          // 1. Available orders (pending, oldest first so long-waiting orders come first)
+          fetchPendingOrders(),
+          // 2. The picker's active order
+          fetchPickerOrders(user.id, { status: "assigned,preparing,delivering", limit: 1 }),
+          // 3. Past orders (archived ones included), newest first; more are loaded on demand
+          fetchPickerOrders(user.id, { status: "completed,cancelled", include_archived: true }),
+        ]);
+
+        setAvailableOrders(await withStallInfo(pendingPage.orders));
+        setAvailableNextToken(pendingPage.nextPageToken);
+        setActiveOrder(activePage.orders.length > 0 ? activePage.orders[0] : null);
+        setCompletedOrders(historyPage.orders);
+        setHistoryNextToken(historyPage.nextPageToken);
+        await refreshTotals(user.id);
       } catch (error) {
         console.error("Error fetching picker data:", error);
         toast.error("Failed to load picker data");
@@ -603,6 +593,46 @@ export default function PickerDashboard() {
     };
   }, [user, navigate]);
 
+  // Append the next page of available orders
+  const loadMoreAvailable = async () => {
+    if (!availableNextToken) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPendingOrders(availableNextToken);
+      const orders = await withStallInfo(page.orders);
+      setAvailableOrders((prev) => [
+        ...prev,
+        ...orders.filter((order) => !prev.some((o) => o.id === order.id)),
+      ]);
+      setAvailableNextToken(page.nextPageToken);
+    } catch (error) {
+      console.error("Error fetching more available orders:", error);
+      toast.error("Failed to load more orders");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Append the next page of past orders
+  const loadMoreHistory = async () => {
+    if (!user || !historyNextToken) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPickerOrders(user.id, {
+        status: "completed,cancelled",
+        include_archived: true,
+        page_token: historyNextToken,
+      });
+      setCompletedOrders((prev) => [...prev, ...page.orders]);
+      setHistoryNextToken(page.nextPageToken);
+    } catch (error) {
+      console.error("Error fetching more past orders:", error);
+      toast.error("Failed to load more orders");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAcceptOrder = async (orderId: string) => {
     try {
       // First, check if the picker already has an active order
@@ -657,6 +687,7 @@ export default function PickerDashboard() {
       if (newStatus === "completed") {
         setActiveOrder(null);
         setCompletedOrders((prev) => [updatedOrder, ...prev]);
+        if (user) refreshTotals(user.id);
         toast.success("Order marked as delivered!");
       } else {
         setActiveOrder(updatedOrder);
@@ -688,14 +719,10 @@ export default function PickerDashboard() {
 
       // Refresh available orders after a short delay to allow the backend to update
       setTimeout(() => {
-        axios
-          .get(`${API.ORDER_URL}/orders`)
-          .then((response) => {
-            const pendingOrders = response.data.filter(
-              (order: any) =>
-                order.order_status === "pending" && !order.picker_id
-            );
-            setAvailableOrders(pendingOrders);
+        fetchPendingOrders()
+          .then(async (pendingPage) => {
+            setAvailableOrders(await withStallInfo(pendingPage.orders));
+            setAvailableNextToken(pendingPage.nextPageToken);
             // Switch to available tab
             setActiveTab("available");
           })
@@ -709,17 +736,6 @@ export default function PickerDashboard() {
     }
   };
 
-  const calculateTotalEarnings = () => {
-    return completedOrders.reduce((total, order) => {
-      const orderTotal = order.order_items.reduce(
-        (sum: number, item: any) =>
-          sum + item.order_price * item.order_quantity,
-        0
-      );
-      return total + orderTotal * 0.15; // Assuming 15% commission
-    }, 0);
-  };
-
   if (loading) {
     return (
       <div className="container mx-auto px-4 py-8">
@@ -746,7 +762,7 @@ export default function PickerDashboard() {
             Total Earnings
           </h2>
           <p className="text-2xl font-bold">
-            {formatCurrency(calculateTotalEarnings())}
+            {formatCurrency(totalEarnings)}
           </p>
         </div>
       </div>
@@ -786,13 +802,25 @@ export default function PickerDashboard() {
               </p>
             </div>
           ) : (
-            availableOrders.map((order) => (
-              <AvailableOrderCard
-                key={order.id}
-                order={order}
-                onAccept={() => handleAcceptOrder(order.id)}
-              />
-            ))
+            <>
+              {availableOrders.map((order) => (
+                <AvailableOrderCard
+                  key={order.id}
+                  order={order}
+                  onAccept={() => handleAcceptOrder(order.id)}
+                />
+              ))}
+              {availableNextToken && (
+                <Button
+                  variant="outline"
+                  className="w-full"
+                  onClick={loadMoreAvailable}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? "Loading..." : "Load more orders"}
+                </Button>
+              )}
+            </>
           )}
         </TabsContent>
 
@@ -824,11 +852,7 @@ export default function PickerDashboard() {
                   </CardHeader>
                   <CardContent>
                     <div className="text-3xl font-bold">
-                      {
-                        completedOrders.filter(
-                          (o) => o.order_status === "completed"
-                        ).length
-                      }
+                      {completedCount}
                     </div>
                   </CardContent>
                 </Card>
@@ -839,7 +863,7 @@ export default function PickerDashboard() {
                   </CardHeader>
                   <CardContent>
                     <div className="text-3xl font-bold">
-                      {formatCurrency(calculateTotalEarnings())}
+                      {formatCurrency(totalEarnings)}
                     </div>
                   </CardContent>
                 </Card>
@@ -850,6 +874,16 @@ export default function PickerDashboard() {
                 {completedOrders.map((order) => (
                   <CompletedOrderCard key={order.id} order={order} />
                 ))}
+                {historyNextToken && (
+                  <Button
+                    variant="outline"
+                    className="w-full"
+                    onClick={loadMoreHistory}
+                    disabled={loadingMore}
+                  >
+                    {loadingMore ? "Loading..." : "Load more orders"}
+                  </Button>
+                )}
               </div>
             </div>
           )}
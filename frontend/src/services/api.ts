@@ -118,81 +118,192 @@ export const createOrder = async (orderData: any) => {
   }
 };
 
-// Fetch orders for a customer
-export const fetchCustomerOrders = async (customerId: string) => {
+// Server-side price of an order, in integer cents
+export interface OrderQuote {
+  subtotal_cents: number;
+  delivery_fee_cents: number;
+  total_cents: number;
+}
+
+// Price cart items against the stall's current menu (the amount checkout will charge)
+export const fetchOrderQuote = async (
+  stallId: string,
+  items: { order_item: string; order_quantity: number }[]
+): Promise<OrderQuote> => {
+  const response = await axios.post<OrderQuote>(`${API_URL}/stalls/${stallId}/quote`, {
+    order_items: items,
+  });
+  return response.data;
+};
+
+// Query parameters supported by the order list endpoints (newest first).
+// The cursor for the next page is returned in the X-Next-Page-Token header.
+export interface OrderListParams {
+  limit?: number;
+  page_token?: string;
+  status?: string;
+  since?: string;
+  order_by?: "order_start desc" | "order_start asc";
+  fields?: string;
+  // Also read old completed/cancelled orders that have been moved to the archive
+  include_archived?: boolean;
+}
+
+// One page of an order list and the cursor for the next one (undefined on the last page)
+export interface OrderPage {
+  orders: any[];
+  nextPageToken?: string;
+}
+
+// Fetch one page of an order list; pass nextPageToken back as page_token to load more
+export const fetchOrderPage = async (
+  url: string,
+  params: OrderListParams = {}
+): Promise<OrderPage> => {
+  const response = await axios.get(url, {
+    params: { limit: API.ORDERS_PAGE_SIZE, ...params },
+  });
+  return {
+    orders: response.data,
+    nextPageToken: response.headers["x-next-page-token"] || undefined,
+  };
+};
+
+// Fetch a page of pending orders, oldest first so the longest-waiting orders come first
+export const fetchPendingOrders = async (pageToken?: string): Promise<OrderPage> => {
+  const page = await fetchOrderPage(`${ORDER_API_URL}/orders`, {
+    status: "pending",
+    order_by: "order_start asc",
+    page_token: pageToken,
+  });
+  return {
+    ...page,
+    orders: page.orders.filter((order: any) => !order.picker_id),
+  };
+};
+
+// Fetch a page of orders for a customer
+export const fetchCustomerOrders = async (
+  customerId: string,
+  params?: OrderListParams
+): Promise<OrderPage> => {
   try {
-    const response = await axios.get(
-      `${ORDER_API_URL}/customers/${customerId}/orders`
+    return await fetchOrderPage(
+      `${ORDER_API_URL}/customers/${customerId}/orders`,
+      params
     );
-    return response.data;
   } catch (error) {
     console.error(`Error fetching orders for customer ${customerId}:`, error);
     throw error;
   }
 };
 
-// Fetch a specific order by ID
-export const fetchOrderById = async (orderId: string) => {
-  try {
-    // Fetch order details
-    const orderResponse = await axios.get(`${ORDER_API_URL}/orders/${orderId}`);
-    const order = orderResponse.data;
+// Count a customer's or picker's orders (a server-side count, no orders are downloaded)
+export const fetchOrderCount = async (
+  owner: "customers" | "pickers",
+  ownerId: string,
+  params: Pick<OrderListParams, "status" | "since" | "include_archived"> = {}
+): Promise<number> => {
+  const response = await axios.get<{ count: number }>(
+    `${ORDER_API_URL}/${owner}/${ownerId}/orders:count`,
+    { params }
+  );
+  return response.data.count;
+};
 
-    // Fetch stall details
-    const stallResponse = await axios.get<StallResponse>(
-      `https://personal-dcwqxa6n.outsystemscloud.com/SMUlivery/rest/FoodStallAPI/GetAllStalls`
-    );
-    const stall = stallResponse.data.FoodStalls.find(
-      (s) => s.stall_id.toString() === order.stall_id
-    );
+// All stalls from the FoodStallAPI. The request is shared by concurrent callers and
+// reused for a minute, so loading several order lists fetches the stalls only once.
+const STALLS_CACHE_MS = 60_000;
+let stallsRequest: Promise<Stall[]> | null = null;
+let stallsRequestedAt = 0;
 
-    // Combine order data with stall information
+export const fetchAllStalls = (): Promise<Stall[]> => {
+  if (!stallsRequest || Date.now() - stallsRequestedAt > STALLS_CACHE_MS) {
+    stallsRequestedAt = Date.now();
+    stallsRequest = axios
+      .get<StallResponse>(
+        `https://personal-dcwqxa6n.outsystemscloud.com/SMUlivery/rest/FoodStallAPI/GetAllStalls`
+      )
+      .then((response) => response.data.FoodStalls || [])
+      .catch((error) => {
+        stallsRequest = null;
+        throw error;
+      });
+  }
+  return stallsRequest;
+};
+
+// Add stall_name and stall_location to orders; the orders are still returned if the
+// stalls cannot be loaded
+export const withStallInfo = async (orders: any[]) => {
+  let stalls: Stall[] = [];
+  try {
+    stalls = await fetchAllStalls();
+  } catch (error) {
+    console.error("Error fetching stalls:", error);
+  }
+  const stallsMap = new Map<string, Stall>(
+    stalls.map((stall) => [String(stall.stall_id), stall])
+  );
+  return orders.map((order: any) => {
+    const stall = stallsMap.get(String(order.stall_id));
     return {
       ...order,
       stall_name: stall?.stall_name || "Unknown Stall",
       stall_location: stall?.stall_location || "Unknown Location",
     };
+  });
+};
+
+// Fetch a specific order by ID
+export const fetchOrderById = async (orderId: string) => {
+  try {
+    // Fetch order details (old completed orders may already be archived)
+    const orderResponse = await axios.get(`${ORDER_API_URL}/orders/${orderId}`, {
+      params: { include_archived: true },
+    });
+    const order = orderResponse.data;
+
+    // Combine order data with stall information
+    const [orderWithStall] = await withStallInfo([order]);
+    return orderWithStall;
   } catch (error) {
     console.error(`Error fetching order ${orderId}:`, error);
     throw error;
   }
 };
 
-// Fetch orders for a picker
-export const fetchPickerOrders = async (pickerId: string) => {
+// Fetch a page of orders for a picker, with stall information
+export const fetchPickerOrders = async (
+  pickerId: string,
+  params?: OrderListParams
+): Promise<OrderPage> => {
   try {
-    // First fetch all orders for the picker
-    const response = await axios.get(
-      `${ORDER_API_URL}/pickers/${pickerId}/orders`
-    );
-    
-    // Then fetch all stalls
-    const stallsResponse = await axios.get(
-      "https://personal-dcwqxa6n.outsystemscloud.com/SMUlivery/rest/FoodStallAPI/GetAllStalls"
+    const page = await fetchOrderPage(
+      `${ORDER_API_URL}/pickers/${pickerId}/orders`,
+      params
     );
-    
-    // Create a map of stall IDs to stall details
-    const stallsMap = new Map(
-      stallsResponse.data.FoodStalls.map((stall: any) => [stall.stall_id.toString(), stall])
-    );
-    
-    // Combine order data with stall information
-    const ordersWithStallInfo = response.data.map((order: any) => {
-      const stall = stallsMap.get(order.stall_id.toString());
-      return {
-        ...order,
-        stall_name: stall?.stall_name || "Unknown Stall",
-        stall_location: stall?.stall_location || "Unknown Location"
-      };
-    });
-    
-    return ordersWithStallInfo;
+    return { ...page, orders: await withStallInfo(page.orders) };
   } catch (error) {
     console.error(`Error fetching orders for picker ${pickerId}:`, error);
     throw error;
   }
 };
 
+// A picker's recorded earnings: settled credits plus earnings not settled yet
+export interface PickerEarnings {
+  settled_credits: number;
+  pending_cents: number;
+  balance: number;
+}
+
+export const fetchPickerEarnings = async (pickerId: string): Promise<PickerEarnings> => {
+  const response = await axios.get<PickerEarnings>(
+    `${API.PICKER_URL}/pickers/${pickerId}/earnings`
+  );
+  return response.data;
+};
+
 // Fetch all food listings from Stamford Road
 export const fetchStamfordFoodListings = async (): Promise<FoodListing[]> => {
   try {